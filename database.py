@@ -1,11 +1,32 @@
 
 import json
 import os
+import sqlite3
+import contextlib
+import copy
+import gzip
+import re
 import datetime
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows: the dev server runs a single process, the thread lock is enough
+    fcntl = None
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 USERS_FILE = os.path.join(DATA_DIR, 'users.json')
 TASKS_FILE = os.path.join(DATA_DIR, 'daily_logs.json')
+TASKS_DIR = os.path.join(DATA_DIR, 'daily_logs')
+
+# Storage backend: 'json' (files in data/) or 'sqlite' (single WAL-mode database file).
+# On first start the SQLite backend imports the existing JSON files once.
+DB_BACKEND = os.environ.get('BLG_DB_BACKEND', 'json').lower()
+SQLITE_FILE = os.environ.get('BLG_DB_PATH', os.path.join(DATA_DIR, 'blg.db'))
+
+# Size at which the task mutation log gets folded into the month partitions
+TASK_LOG_COMPACT_BYTES = 256 * 1024
 
 # Default Initial Data if files don't exist
 DEFAULT_USERS = {
@@ -43,203 +64,1107 @@ DEFAULT_USERS = {
     }
 }
 
+def _new_task(username, title, date_str, project_id=None, taken_ids=()):
+    """Builds a new task record; bumps the timestamp id if it is already in use."""
+    now = datetime.datetime.now()
+    ts = now.timestamp()
+    while str(ts) in taken_ids:
+        ts = round(ts + 0.000001, 6)
+    return {
+        'id': str(ts), # Simple ID
+        'username': username,
+        'date': date_str,
+        'title': title,
+        'project_id': project_id,
+        'completed': False,
+        'timestamp': now.isoformat()
+    }
+
+UNDATED_MONTH = 'undated'
+
+def _task_month(date_str):
+    """Partition key for a task date: 'YYYY-MM', or UNDATED_MONTH if the date is not ISO."""
+    if date_str and re.match(r'^\d{4}-\d{2}', str(date_str)):
+        return str(date_str)[:7]
+    return UNDATED_MONTH
+
+def _month_is_closed(month, current_month):
+    return month != UNDATED_MONTH and month < current_month
+
+TASK_STAT_GROUPS = ('user', 'project', 'category')
+
+def _task_category(title):
+    """Category from the '[Category] Title' prefix that project tasks get, '' otherwise."""
+    match = re.match(r'^\[([^\]]+)\]', title or '')
+    return match.group(1) if match else ''
+
+def _count_task(daily, task, sign=1):
+    """Adds (sign=1) or removes (sign=-1) a task in {date: {group: {key: [total, completed]}}}."""
+    if not task.get('date'):
+        return
+    day = daily.setdefault(task.get('date'), {})
+    done = 1 if task.get('completed') else 0
+    for group, key in (('user', task.get('username') or ''),
+                       ('project', task.get('project_id') or ''),
+                       ('category', _task_category(task.get('title')))):
+        counts = day.setdefault(group, {}).setdefault(key, [0, 0])
+        counts[0] += sign
+        counts[1] += sign * done
+        if counts[0] <= 0:
+            del day[group][key]
+
+def _task_stats_result(rows):
+    """Turns (key, date, total, completed) rows into the get_task_stats result."""
+    groups = {}
+    for key, date_str, total, completed in rows:
+        g = groups.setdefault(key, {'key': key, 'total': 0, 'completed': 0, 'days': {}})
+        g['total'] += total
+        g['completed'] += completed
+        g['days'][date_str] = [total, completed]
+    result = sorted(groups.values(), key=lambda g: g['key'])
+    for g in result:
+        g['rate'] = round(g['completed'] / g['total'], 4) if g['total'] else 0
+    return result
+
+def _partition_summary(tasks):
+    daily = {}
+    for t in tasks:
+        _count_task(daily, t)
+    return {
+        'count': len(tasks),
+        'projects': sorted({t.get('project_id') for t in tasks if t.get('project_id')}),
+        'daily': daily
+    }
+
+def _task_batch_records(new_tasks, updates, deletes, existing):
+    """Turns a batch into mutation records, skipping ids that are not in `existing`."""
+    records = []
+    created = []
+    taken = set(existing)
+    for spec in new_tasks or []:
+        spec = dict(spec)
+        task = _new_task(spec.pop('username'), spec.pop('title'), spec.pop('date'),
+                         spec.pop('project_id', None), taken)
+        task.update(spec)
+        taken.add(task['id'])
+        created.append(task)
+        records.append({'op': 'add', 'task': task})
+    for task_id, changes in (updates or {}).items():
+        if task_id in existing and changes:
+            records.append({'op': 'update', 'id': task_id, 'updates': changes})
+    for task_id in deletes or []:
+        if task_id in existing:
+            records.append({'op': 'delete', 'id': task_id})
+    return records, created
+
 class Database:
-    def __init__(self):
-        self._ensure_files()
+    def __init__(self, data_dir=None, read_only=False):
+        self.data_dir = data_dir or DATA_DIR
+        # read_only: never writes (no default users, daily_logs.json is not migrated); used by migrate_json_to_sqlite
+        self.read_only = read_only
+        self.users_file = os.path.join(self.data_dir, 'users.json')
+        self.tasks_file = os.path.join(self.data_dir, 'daily_logs.json')
+        self.projects_file = os.path.join(self.data_dir, 'projects.json')
+        self.tasks_dir = os.path.join(self.data_dir, 'daily_logs')
+        self.manifest_file = os.path.join(self.tasks_dir, 'manifest.json')
+        self.tasks_log_file = os.path.join(self.data_dir, 'daily_logs.wal')
+        self.tasks_lock_file = os.path.join(self.data_dir, 'daily_logs.lock')
+
+        self._lock = threading.RLock()
+        self._tasks_stamp = False # never loaded
+        self._manifest = {}
+        self._partitions = {}
+        self._pending = {}
+        self._log_months = set()
+        self._daily_stats = {}
+        self._tasks_by_id = {}
+        self._tasks_by_user_date = {}
+        self._tasks_by_date = {}
+        self._tasks_by_project = {}
+        self._log_ino = None
+        self._log_offset = 0
+        self._compacting = False
+        self._json_cache = {}
+
+        if not read_only:
+            self._ensure_files()
 
     def _ensure_files(self):
-        if not os.path.exists(DATA_DIR):
-            os.makedirs(DATA_DIR)
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
         
-        if not os.path.exists(USERS_FILE):
+        if not os.path.exists(self.users_file):
             self.save_users(DEFAULT_USERS)
             
-        if not os.path.exists(TASKS_FILE):
-            with open(TASKS_FILE, 'w', encoding='utf-8') as f:
-                json.dump([], f)
 
-    def load_users(self):
+    # --- Users & Projects cache ---
+    # users.json and projects.json are parsed once and served from memory. Every
+    # read stats the file and re-parses it only if mtime/size changed, so edits made
+    # by another worker are still picked up. Callers always get deep copies.
+    def _read_cached(self, key, path, loader):
+        stamp = self._file_stamp(path)
+        cached = self._json_cache.get(key)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            return cached[1]
+        data = loader()
+        self._json_cache[key] = (stamp, data)
+        return data
+
+    def _store_cached(self, key, path, data):
+        self._json_cache[key] = (self._file_stamp(path), copy.deepcopy(data))
+
+    def _cached_users(self):
+        return self._read_cached('users', self.users_file, self._read_users_file)
+
+    def _read_users_file(self):
         try:
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
+            with open(self.users_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
             print(f"Error loading users: {e}")
             return {}
 
+    def load_users(self):
+        with self._lock:
+            return copy.deepcopy(self._cached_users())
+
     def save_users(self, users_data):
-        try:
-            with open(USERS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(users_data, f, indent=4)
-            return True
-        except Exception as e:
-            print(f"Error saving users: {e}")
-            return False
+        with self._lock:
+            try:
+                with open(self.users_file, 'w', encoding='utf-8') as f:
+                    json.dump(users_data, f, indent=4)
+                self._store_cached('users', self.users_file, users_data)
+                return True
+            except Exception as e:
+                print(f"Error saving users: {e}")
+                self._json_cache.pop('users', None)
+                return False
 
     def get_user(self, username):
-        users = self.load_users()
-        return users.get(username)
+        with self._lock:
+            return copy.deepcopy(self._cached_users().get(username))
 
     def update_user_settings(self, username, settings_dict):
         """Allows partial updates to user profile/settings"""
-        users = self.load_users()
-        if username in users:
-            users[username].update(settings_dict)
-            self.save_users(users)
-            return True
-        return False
+        with self._lock:
+            users = self.load_users()
+            if username in users:
+                users[username].update(settings_dict)
+                self.save_users(users)
+                return True
+            return False
     
     def add_user(self, username, user_data):
-        users = self.load_users()
-        if username in users:
-            return False # Already exists
-        users[username] = user_data
-        self.save_users(users)
-        return True
-
-    def delete_user(self, username):
-        users = self.load_users()
-        if username in users:
-            del users[username]
+        with self._lock:
+            users = self.load_users()
+            if username in users:
+                return False # Already exists
+            users[username] = user_data
             self.save_users(users)
             return True
-        return False
+
+    def delete_user(self, username):
+        with self._lock:
+            users = self.load_users()
+            if username in users:
+                del users[username]
+                self.save_users(users)
+                return True
+            return False
 
     # --- Daily Tasks Logic ---
+    # Tasks are served from an in-memory copy of the task store with secondary
+    # indexes on id, (username, date), date and project_id, so lookups cost O(result).
+    #
+    # On disk the store is partitioned by month (data/daily_logs/YYYY-MM.json) plus an
+    # append-only mutation log (daily_logs.wal, one JSON record per line). Writes only
+    # append a record; once the log passes TASK_LOG_COMPACT_BYTES it is rotated to a
+    # segment and folded into the partitions it touched on a background thread.
+    # Partitions of closed months are gzipped and only loaded when a query needs
+    # them; manifest.json lists the projects found in each partition so project
+    # lookups do not have to open every month. Replaying a record is idempotent, so
+    # readers may safely replay segments that are already part of the partitions.
     def get_user_tasks(self, username, date_str):
-        all_tasks = self._load_tasks()
-        # Filter by username and date
-        user_tasks = [t for t in all_tasks if t.get('username') == username and t.get('date') == date_str]
-        return user_tasks
+        with self._lock:
+            self._refresh_tasks()
+            self._load_month(_task_month(date_str))
+            return [dict(t) for t in self._tasks_by_user_date.get((username, date_str), [])]
 
     def add_task(self, username, title, date_str, project_id=None):
-        tasks = self._load_tasks()
-        new_task = {
-            'id': str(datetime.datetime.now().timestamp()), # Simple ID
-            'username': username,
-            'date': date_str,
-            'title': title,
-            'project_id': project_id,
-            'completed': False,
-            'timestamp': datetime.datetime.now().isoformat()
-        }
-        tasks.append(new_task)
-        self._save_tasks(tasks)
-        return new_task
+        with self._lock:
+            self._refresh_tasks()
+            self._load_month(_task_month(date_str))
+            new_task = _new_task(username, title, date_str, project_id, self._tasks_by_id)
+            self._write_task_records([{'op': 'add', 'task': new_task}])
+            return dict(new_task)
 
     def update_task_status(self, task_id, completed):
         return self.update_task(task_id, {'completed': completed})
 
     def update_task(self, task_id, updates):
-        tasks = self._load_tasks()
-        for t in tasks:
-            if t.get('id') == task_id:
-                t.update(updates)
-                self._save_tasks(tasks)
-                return True
-        return False
+        with self._lock:
+            self._refresh_tasks()
+            if self._find_task(task_id) is None:
+                return False
+            self._write_task_records([{'op': 'update', 'id': task_id, 'updates': updates}])
+            return True
 
     def delete_task(self, task_id):
-        tasks = self._load_tasks()
-        initial_len = len(tasks)
-        tasks = [t for t in tasks if t.get('id') != task_id]
-        if len(tasks) < initial_len:
-            self._save_tasks(tasks)
+        with self._lock:
+            self._refresh_tasks()
+            if self._find_task(task_id) is None:
+                return False
+            self._write_task_records([{'op': 'delete', 'id': task_id}])
             return True
-        return False
     
     def get_all_tasks_by_date(self, date_str):
-        all_tasks = self._load_tasks()
-        return [t for t in all_tasks if t.get('date') == date_str]
+        with self._lock:
+            self._refresh_tasks()
+            self._load_month(_task_month(date_str))
+            return [dict(t) for t in self._tasks_by_date.get(date_str, [])]
 
     def get_tasks_by_project(self, project_id):
-        all_tasks = self._load_tasks()
-        return [t for t in all_tasks if t.get('project_id') == project_id]
+        with self._lock:
+            self._refresh_tasks()
+            self._load_project_months(project_id)
+            return [dict(t) for t in self._tasks_by_project.get(project_id, [])]
 
     def delete_task_by_project_and_user(self, project_id, username):
-        tasks = self._load_tasks()
-        initial_len = len(tasks)
-        # Keep tasks that DO NOT match both project_id and username
-        new_tasks = []
-        for t in tasks:
-            if t.get('project_id') == project_id and t.get('username') == username:
-                continue
-            new_tasks.append(t)
-        
-        if len(new_tasks) < initial_len:
-            self._save_tasks(new_tasks)
+        with self._lock:
+            self._refresh_tasks()
+            self._load_project_months(project_id)
+            # Remove tasks that match both project_id and username
+            matches = [t for t in self._tasks_by_project.get(project_id, []) if t.get('username') == username]
+            if not matches:
+                return False
+            self._write_task_records([{'op': 'delete', 'id': t.get('id')} for t in matches])
             return True
-        return False
 
-    def _load_tasks(self):
+    def apply_task_batch(self, new_tasks=None, updates=None, deletes=None):
+        """
+        Applies several task changes with a single refresh and a single log append.
+            new_tasks: list of dicts with username, title, date and optional project_id
+                       (any other keys, e.g. completed, override the defaults)
+            updates: {task_id: {field: value}} (unknown ids are skipped)
+            deletes: list of task ids (unknown ids are skipped)
+        Returns the created tasks.
+        """
+        with self._lock:
+            self._refresh_tasks()
+            for spec in new_tasks or []:
+                self._load_month(_task_month(spec.get('date')))
+            for task_id in list(updates or {}) + list(deletes or []):
+                self._find_task(task_id)
+            records, created = _task_batch_records(new_tasks, updates, deletes, self._tasks_by_id)
+            if records:
+                self._write_task_records(records)
+            return [dict(t) for t in created]
+
+    def get_task_stats(self, date_from, date_to, group_by='user'):
+        """
+        Task totals and completion rates per user, project or category for dates in
+        [date_from, date_to], with a per-day breakdown. Served from daily aggregates:
+        kept in memory for loaded months and stored in the manifest for the rest.
+        """
+        with self._lock:
+            self._refresh_tasks()
+            rows = []
+            for month in sorted(set(self._manifest) | set(self._partitions) | set(self._pending)):
+                if month == UNDATED_MONTH or not date_from[:7] <= month <= date_to[:7]:
+                    continue
+                if month in self._pending or 'daily' not in self._manifest.get(month, {'daily': None}):
+                    # Unsaved changes, or a manifest written before aggregates existed
+                    self._load_month(month)
+                if month in self._partitions:
+                    daily = self._daily_stats.get(month, {})
+                else:
+                    daily = self._manifest[month]['daily']
+                for date_str, day in daily.items():
+                    if date_from <= date_str <= date_to:
+                        rows.extend((key, date_str, total, completed)
+                                    for key, (total, completed) in day.get(group_by, {}).items())
+            return _task_stats_result(rows)
+
+    def compact_tasks(self):
+        """Folds the mutation log into the month partitions it touched and gzips closed months."""
+        # Serialized across workers: appends wait while the log is rotated, folded and deleted
+        with self._lock, self._task_log_lock():
+            self._refresh_tasks()
+            segment = None
+            if os.path.exists(self.tasks_log_file):
+                # Rotate the log so new writes go to a fresh file while we serialize
+                segment = f"{self.tasks_log_file}.{time.time_ns()}"
+                try:
+                    os.replace(self.tasks_log_file, segment)
+                except OSError as e:
+                    print(f"Error rotating task log: {e}")
+                    return False
+                # Pick up records other workers appended since our last refresh
+                self._replay_task_log(segment, self._log_offset)
+                self._log_offset = 0
+                self._log_ino = None
+
+            current = datetime.date.today().strftime('%Y-%m')
+            dirty = set(self._log_months)
+            # Months that closed since they were last written only need compressing
+            dirty.update(m for m, compressed in self._partition_files().items()
+                         if not compressed and _month_is_closed(m, current))
+            if not dirty:
+                return False
+            for month in dirty:
+                self._load_month(month)
+            self._log_months = set()
+            snapshot = {m: [dict(t) for t in self._partitions.get(m, {}).values()] for m in dirty}
+
+            try:
+                written = {m: self._write_partition_tmp(m, tasks, _month_is_closed(m, current))
+                           for m, tasks in snapshot.items()}
+                manifest = self._read_manifest()
+                for month, (tmp_file, target) in written.items():
+                    for path in self._partition_paths(month):
+                        if (path != target or not tmp_file) and os.path.exists(path):
+                            os.remove(path)
+                    if tmp_file:
+                        os.replace(tmp_file, target)
+                        manifest[month] = _partition_summary(snapshot[month])
+                    else:
+                        manifest.pop(month, None)
+                self._write_manifest(manifest)
+                self._manifest = manifest
+                self._tasks_stamp = self._file_stamp(self.manifest_file)
+                if segment:
+                    for old in self._task_log_segments():
+                        if old <= segment:
+                            os.remove(old)
+                return True
+            except Exception as e:
+                print(f"Error compacting tasks: {e}")
+                return False
+
+    @contextlib.contextmanager
+    def _task_log_lock(self):
+        """Exclusive lock (shared by all worker processes) around log appends and compaction."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.tasks_lock_file, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _write_task_records(self, records):
+        """Appends mutation records to the log and applies them in memory."""
+        records = self._route_records(records)
+        payload = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
         try:
-            if not os.path.exists(TASKS_FILE):
-                return []
-            with open(TASKS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
+            # Under the lock, so compaction cannot rotate the file between open and write
+            with self._task_log_lock(), open(self.tasks_log_file, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                st = os.fstat(f.fileno())
+        except Exception as e:
+            print(f"Error saving tasks: {e}")
+            return
+
+        for r in records:
+            self._apply_task_record(r)
+        # Only advance past our own records if no other worker appended in between;
+        # otherwise the next refresh replays them (idempotently) together with theirs.
+        if self._log_ino in (None, st.st_ino) and st.st_size == self._log_offset + len(payload):
+            self._log_ino = st.st_ino
+            self._log_offset = st.st_size
+
+        if st.st_size > TASK_LOG_COMPACT_BYTES and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._background_compact, daemon=True).start()
+
+    def _route_records(self, records):
+        """
+        Tags update/delete records with the month partition of their (loaded) task.
+        An update that moves a task to another month becomes a delete plus an add,
+        so every record touches exactly one partition.
+        """
+        routed = []
+        for r in records:
+            if r['op'] == 'add':
+                routed.append(r)
+                continue
+            task = self._tasks_by_id.get(r['id'])
+            month = _task_month(task.get('date'))
+            if r['op'] == 'update' and 'date' in r['updates'] and _task_month(r['updates']['date']) != month:
+                moved = dict(task)
+                moved.update(r['updates'])
+                self._load_month(_task_month(moved.get('date')))
+                routed.append({'op': 'delete', 'id': r['id'], 'month': month})
+                routed.append({'op': 'add', 'task': moved})
+            else:
+                routed.append(dict(r, month=month))
+        return routed
+
+    def _background_compact(self):
+        try:
+            self.compact_tasks()
+        finally:
+            self._compacting = False
+
+    def _record_month(self, record):
+        if record.get('op') == 'add':
+            return _task_month(record['task'].get('date'))
+        return record.get('month', UNDATED_MONTH)
+
+    def _apply_task_record(self, record):
+        month = self._record_month(record)
+        self._log_months.add(month)
+        if month not in self._partitions:
+            # Partition not loaded yet: keep the record until a query needs that month
+            self._pending.setdefault(month, []).append(record)
+            return
+        op = record.get('op')
+        if op == 'add':
+            task = dict(record['task'])
+            existing = self._tasks_by_id.get(task.get('id'))
+            if existing is not None:
+                self._unindex_task(existing)
+            self._index_task(task)
+        elif op == 'update':
+            task = self._tasks_by_id.get(record.get('id'))
+            if task is not None:
+                self._unindex_task(task)
+                task.update(record.get('updates', {}))
+                self._index_task(task)
+        elif op == 'delete':
+            task = self._tasks_by_id.get(record.get('id'))
+            if task is not None:
+                self._unindex_task(task)
+
+    def _replay_task_log(self, path, offset=0):
+        """Applies complete records from `path` starting at byte `offset`; returns the new offset."""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return offset
+        # Ignore a trailing partial line that another worker is still writing
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply_task_record(json.loads(line))
+            except Exception as e:
+                print(f"Skipping bad task log record: {e}")
+        return offset + end
+
+    def _task_log_segments(self):
+        prefix = os.path.basename(self.tasks_log_file) + '.'
+        try:
+            names = [n for n in os.listdir(self.data_dir) if n.startswith(prefix) and n[len(prefix):].isdigit()]
+        except OSError: # read-only view of a data directory that does not exist
             return []
+        return sorted((os.path.join(self.data_dir, n) for n in names), key=lambda p: int(p.rsplit('.', 1)[1]))
+
+    def _index_task(self, task):
+        month = _task_month(task.get('date'))
+        self._partitions.setdefault(month, {})[task.get('id')] = task
+        _count_task(self._daily_stats.setdefault(month, {}), task)
+        self._tasks_by_id[task.get('id')] = task
+        self._tasks_by_user_date.setdefault((task.get('username'), task.get('date')), []).append(task)
+        self._tasks_by_date.setdefault(task.get('date'), []).append(task)
+        self._tasks_by_project.setdefault(task.get('project_id'), []).append(task)
 
-    def _save_tasks(self, tasks):
+    def _unindex_task(self, task):
+        month = _task_month(task.get('date'))
+        self._partitions.get(month, {}).pop(task.get('id'), None)
+        _count_task(self._daily_stats.setdefault(month, {}), task, -1)
+        self._tasks_by_id.pop(task.get('id'), None)
+        for index, key in ((self._tasks_by_user_date, (task.get('username'), task.get('date'))),
+                           (self._tasks_by_date, task.get('date')),
+                           (self._tasks_by_project, task.get('project_id'))):
+            bucket = index.get(key)
+            if bucket is None:
+                continue
+            bucket[:] = [t for t in bucket if t is not task]
+            if not bucket:
+                del index[key]
+
+    def _file_stamp(self, path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _refresh_tasks(self):
+        """Brings the in-memory task indexes up to date with the partitions and the log."""
+        stamp = self._file_stamp(self.manifest_file)
         try:
-            with open(TASKS_FILE, 'w', encoding='utf-8') as f:
+            log_st = os.stat(self.tasks_log_file)
+            log_ino, log_size = log_st.st_ino, log_st.st_size
+        except OSError:
+            log_ino, log_size = None, 0
+
+        if stamp == self._tasks_stamp:
+            if log_ino is None and self._log_ino is None:
+                return
+            if log_ino == self._log_ino and log_size >= self._log_offset:
+                # Same log file: only replay what other workers appended
+                if log_size > self._log_offset:
+                    self._log_offset = self._replay_task_log(self.tasks_log_file, self._log_offset)
+                return
+            if self._log_ino is None and self._log_offset == 0 and log_ino is not None:
+                self._log_ino = log_ino
+                self._log_offset = self._replay_task_log(self.tasks_log_file, 0)
+                return
+
+        # Partitions were rewritten or the log was rotated: start over. Partitions
+        # themselves are loaded lazily, so this only replays the log.
+        legacy_tasks = []
+        if not os.path.exists(self.tasks_dir) and self.read_only:
+            # The single-file store stays as it is; its tasks are replayed before the log
+            if os.path.exists(self.tasks_file):
+                legacy_tasks = self._read_legacy_tasks()
+        elif not os.path.exists(self.tasks_dir):
+            if os.path.exists(self.tasks_file):
+                with self._task_log_lock():
+                    self._migrate_legacy_tasks()
+            else:
+                os.makedirs(self.tasks_dir)
+            stamp = self._file_stamp(self.manifest_file)
+            log_ino = None
+        self._partitions = {}
+        self._pending = {}
+        self._log_months = set()
+        self._daily_stats = {}
+        self._tasks_by_id = {}
+        self._tasks_by_user_date = {}
+        self._tasks_by_date = {}
+        self._tasks_by_project = {}
+        self._manifest = self._read_manifest()
+        self._tasks_stamp = stamp
+        for t in legacy_tasks:
+            self._apply_task_record({'op': 'add', 'task': t})
+        for segment in self._task_log_segments():
+            self._replay_task_log(segment)
+        self._log_ino = log_ino
+        self._log_offset = self._replay_task_log(self.tasks_log_file) if log_ino is not None else 0
+
+    def _load_month(self, month):
+        """Loads one month partition (and its pending log records) into the indexes."""
+        if month in self._partitions:
+            return
+        self._partitions[month] = {}
+        for t in self._read_partition(month):
+            self._index_task(t)
+        for r in self._pending.pop(month, []):
+            self._apply_task_record(r)
+
+    def _load_project_months(self, project_id):
+        files = self._partition_files()
+        for month in files:
+            summary = self._manifest.get(month)
+            if month in self._pending or summary is None or project_id in summary.get('projects', []):
+                self._load_month(month)
+        for month in list(self._pending):
+            self._load_month(month)
+
+    def _find_task(self, task_id):
+        """Returns the task with `task_id`, loading partitions newest-first until it is found."""
+        task = self._tasks_by_id.get(task_id)
+        if task is not None:
+            return task
+        for month, records in list(self._pending.items()):
+            if any(r.get('id') == task_id or r.get('task', {}).get('id') == task_id for r in records):
+                self._load_month(month)
+        for month in sorted(self._partition_files(), reverse=True):
+            if task_id in self._tasks_by_id:
+                break
+            self._load_month(month)
+        return self._tasks_by_id.get(task_id)
+
+    def _all_tasks(self):
+        for month in list(self._partition_files()) + list(self._pending):
+            self._load_month(month)
+        return list(self._tasks_by_id.values())
+
+    def _partition_paths(self, month):
+        base = os.path.join(self.tasks_dir, f"{month}.json")
+        return base, base + '.gz'
+
+    def _partition_files(self):
+        """{month: compressed} for every partition on disk."""
+        months = {}
+        try:
+            names = os.listdir(self.tasks_dir)
+        except OSError:
+            return months
+        for n in names:
+            if n.endswith('.json.gz'):
+                months[n[:-8]] = True
+            elif n.endswith('.json') and n != 'manifest.json':
+                months.setdefault(n[:-5], False)
+        return months
+
+    def _read_partition(self, month):
+        plain, compressed = self._partition_paths(month)
+        try:
+            if os.path.exists(compressed):
+                with gzip.open(compressed, 'rt', encoding='utf-8') as f:
+                    return json.load(f)
+            if os.path.exists(plain):
+                with open(plain, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading tasks for {month}: {e}")
+        return []
+
+    def _write_partition_tmp(self, month, tasks, compress):
+        """Writes a partition to a temp file; returns (tmp_file or None if empty, final path)."""
+        plain, compressed = self._partition_paths(month)
+        target = compressed if compress else plain
+        if not tasks:
+            return None, target
+        tmp_file = f"{target}.{os.getpid()}.tmp"
+        if compress:
+            with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+                json.dump(tasks, f)
+        else:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(tasks, f, indent=4)
+        return tmp_file, target
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_manifest(self, manifest):
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _read_legacy_tasks(self):
+        try:
+            with open(self.tasks_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
         except Exception as e:
-            print(f"Error saving tasks: {e}")
+            print(f"Error loading tasks: {e}")
+            return []
+
+    def _migrate_legacy_tasks(self):
+        """Splits a single daily_logs.json (plus its pending log) into month partitions."""
+        tasks = {t.get('id'): t for t in self._read_legacy_tasks()}
+        for path in self._task_log_segments() + [self.tasks_log_file]:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    r = json.loads(line)
+                    if r['op'] == 'add':
+                        tasks[r['task'].get('id')] = dict(r['task'])
+                    elif r['op'] == 'update' and r.get('id') in tasks:
+                        tasks[r['id']].update(r.get('updates', {}))
+                    elif r['op'] == 'delete':
+                        tasks.pop(r.get('id'), None)
+
+        by_month = {}
+        for t in tasks.values():
+            by_month.setdefault(_task_month(t.get('date')), []).append(t)
+        os.makedirs(self.tasks_dir, exist_ok=True)
+        current = datetime.date.today().strftime('%Y-%m')
+        manifest = {}
+        for month, month_tasks in by_month.items():
+            tmp_file, target = self._write_partition_tmp(month, month_tasks, _month_is_closed(month, current))
+            os.replace(tmp_file, target)
+            manifest[month] = _partition_summary(month_tasks)
+        self._write_manifest(manifest)
+        for path in self._task_log_segments() + [self.tasks_log_file]:
+            if os.path.exists(path):
+                os.remove(path)
+        os.replace(self.tasks_file, self.tasks_file + '.migrated')
 
     # --- Projects Logic ---
     def get_projects(self):
-        return self._load_projects()
+        with self._lock:
+            return copy.deepcopy(self._cached_projects()[0])
 
     def get_project(self, project_id):
-        projects = self._load_projects()
-        return next((p for p in projects if p['id'] == project_id), None)
+        with self._lock:
+            return copy.deepcopy(self._cached_projects()[1].get(project_id))
 
     def save_project(self, project_data):
-        projects = self._load_projects()
-        # Check if update
-        existing = next((i for i, p in enumerate(projects) if p['id'] == project_data['id']), None)
-        if existing is not None:
-            projects[existing] = project_data
-        else:
-            projects.append(project_data)
-        self._save_projects(projects)
-        return True
+        with self._lock:
+            projects = self.get_projects()
+            # Check if update
+            existing = next((i for i, p in enumerate(projects) if p['id'] == project_data['id']), None)
+            if existing is not None:
+                projects[existing] = project_data
+            else:
+                projects.append(project_data)
+            self._save_projects(projects)
+            return True
 
     def archive_project(self, project_id):
-        projects = self._load_projects()
-        for p in projects:
-            if p['id'] == project_id:
-                p['archived'] = True
-                p['archived_at'] = datetime.datetime.now().isoformat()
+        with self._lock:
+            projects = self.get_projects()
+            for p in projects:
+                if p['id'] == project_id:
+                    p['archived'] = True
+                    p['archived_at'] = datetime.datetime.now().isoformat()
+                    self._save_projects(projects)
+                    return True
+            return False
+
+    def delete_project(self, project_id):
+        with self._lock:
+            projects = self.get_projects()
+            initial_len = len(projects)
+            projects = [p for p in projects if p['id'] != project_id]
+            if len(projects) < initial_len:
                 self._save_projects(projects)
                 return True
-        return False
+            return False
 
-    def delete_project(self, project_id):
-        projects = self._load_projects()
-        initial_len = len(projects)
-        projects = [p for p in projects if p['id'] != project_id]
-        if len(projects) < initial_len:
-            self._save_projects(projects)
-            return True
-        return False
+    def _cached_projects(self):
+        """Returns (projects list, {id: project}) from the cache."""
+        return self._read_cached('projects', self.projects_file, lambda: self._index_projects(self._load_projects()))
+
+    def _index_projects(self, projects):
+        return projects, {p.get('id'): p for p in projects}
         
     def _load_projects(self):
-        PROJECTS_FILE = os.path.join(DATA_DIR, 'projects.json')
         try:
-            if not os.path.exists(PROJECTS_FILE):
+            if not os.path.exists(self.projects_file):
                 return []
-            with open(PROJECTS_FILE, 'r', encoding='utf-8') as f:
+            with open(self.projects_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except:
             return []
 
     def _save_projects(self, projects):
-        PROJECTS_FILE = os.path.join(DATA_DIR, 'projects.json')
         try:
-            with open(PROJECTS_FILE, 'w', encoding='utf-8') as f:
+            with open(self.projects_file, 'w', encoding='utf-8') as f:
                 json.dump(projects, f, indent=4)
+            self._store_cached('projects', self.projects_file, self._index_projects(projects))
         except Exception as e:
             print(f"Error saving projects: {e}")
+            self._json_cache.pop('projects', None)
+
+
+class SQLiteStore:
+    """SQLite file in WAL mode with one autocommit connection per thread; subclasses set SCHEMA."""
+    SCHEMA = ""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        if not os.path.exists(os.path.dirname(os.path.abspath(self.db_path))):
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)))
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+
+class SQLiteDatabase(SQLiteStore):
+    """
+    Same public API as `Database`, backed by SQLite in WAL mode.
+    Safe to share between several gunicorn workers: every read-modify-write
+    runs inside a `BEGIN IMMEDIATE` transaction instead of rewriting whole files.
+    User, task and project records are stored as JSON documents; the fields
+    we query on are mirrored into indexed columns.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            username TEXT,
+            date TEXT,
+            project_id TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_date ON tasks (username, date);
+        CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks (date);
+        CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks (project_id);
+        CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS task_daily_stats (
+            date TEXT NOT NULL,
+            grp TEXT NOT NULL,
+            key TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            completed INTEGER NOT NULL,
+            PRIMARY KEY (date, grp, key)
+        );
+    """
+
+    # Keys of the daily task aggregates; 'category' mirrors _task_category()
+    TASK_STAT_KEYS = {
+        'user': "COALESCE({t}.username, '')",
+        'project': "COALESCE({t}.project_id, '')",
+        'category': "CASE WHEN substr(json_extract({t}.data, '$.title'), 1, 1) = '[' "
+                    "AND instr(json_extract({t}.data, '$.title'), ']') > 2 "
+                    "THEN substr(json_extract({t}.data, '$.title'), 2, "
+                    "instr(json_extract({t}.data, '$.title'), ']') - 2) ELSE '' END",
+    }
+    TASK_STAT_DONE = "(COALESCE(json_extract({t}.data, '$.completed'), 0) != 0)"
+
+    def _task_stat_triggers(self):
+        """Triggers that keep task_daily_stats in sync with every write to tasks."""
+        def upserts(t, sign):
+            return ''.join(
+                f"INSERT INTO task_daily_stats (date, grp, key, total, completed) "
+                f"SELECT {t}.date, '{group}', {expr.format(t=t)}, {sign}, {sign} * {self.TASK_STAT_DONE.format(t=t)} "
+                f"WHERE {t}.date IS NOT NULL "
+                f"ON CONFLICT (date, grp, key) DO UPDATE SET "
+                f"total = total + excluded.total, completed = completed + excluded.completed; "
+                for group, expr in self.TASK_STAT_KEYS.items())
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS tasks_stats_insert AFTER INSERT ON tasks BEGIN {upserts('NEW', 1)} END",
+            f"CREATE TRIGGER IF NOT EXISTS tasks_stats_delete AFTER DELETE ON tasks BEGIN {upserts('OLD', -1)} END",
+            f"CREATE TRIGGER IF NOT EXISTS tasks_stats_update AFTER UPDATE ON tasks "
+            f"BEGIN {upserts('OLD', -1)} {upserts('NEW', 1)} END",
+        ]
+
+    def __init__(self, db_path=None, data_dir=None):
+        self.data_dir = data_dir or DATA_DIR
+        super().__init__(db_path or SQLITE_FILE)
+        self._build_task_stats()
+        migrate_json_to_sqlite(self, self.data_dir)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _build_task_stats(self):
+        """Installs the aggregate triggers and backfills tasks written before they existed."""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'task_stats_built'").fetchone():
+                return
+            for trigger in self._task_stat_triggers():
+                conn.execute(trigger)
+            conn.execute('DELETE FROM task_daily_stats')
+            for group, expr in self.TASK_STAT_KEYS.items():
+                conn.execute(f"INSERT INTO task_daily_stats (date, grp, key, total, completed) "
+                             f"SELECT tasks.date, ?, {expr.format(t='tasks')}, COUNT(*), "
+                             f"SUM({self.TASK_STAT_DONE.format(t='tasks')}) FROM tasks "
+                             f"WHERE tasks.date IS NOT NULL GROUP BY 1, 3", (group,))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('task_stats_built', ?)",
+                         (datetime.datetime.now().isoformat(),))
+
+    # --- Users ---
+    def load_users(self):
+        rows = self._conn().execute('SELECT username, data FROM users ORDER BY rowid').fetchall()
+        return {u: json.loads(d) for u, d in rows}
+
+    def save_users(self, users_data):
+        try:
+            with self._transaction() as conn:
+                conn.execute('DELETE FROM users')
+                conn.executemany('INSERT INTO users (username, data) VALUES (?, ?)',
+                                 [(u, json.dumps(d)) for u, d in users_data.items()])
+            return True
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            return False
+
+    def get_user(self, username):
+        row = self._conn().execute('SELECT data FROM users WHERE username = ?', (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_user_settings(self, username, settings_dict):
+        """Allows partial updates to user profile/settings"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT data FROM users WHERE username = ?', (username,)).fetchone()
+            if not row:
+                return False
+            user = json.loads(row[0])
+            user.update(settings_dict)
+            conn.execute('UPDATE users SET data = ? WHERE username = ?', (json.dumps(user), username))
+            return True
+
+    def add_user(self, username, user_data):
+        with self._transaction() as conn:
+            cur = conn.execute('INSERT OR IGNORE INTO users (username, data) VALUES (?, ?)',
+                               (username, json.dumps(user_data)))
+            return cur.rowcount > 0 # False if already exists
+
+    def delete_user(self, username):
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM users WHERE username = ?', (username,)).rowcount > 0
+
+    # --- Daily Tasks ---
+    def _query_tasks(self, where, params):
+        rows = self._conn().execute(f'SELECT data FROM tasks WHERE {where} ORDER BY rowid', params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def _put_task(self, conn, task):
+        # Upsert rather than INSERT OR REPLACE: REPLACE would skip the stats delete trigger
+        conn.execute('INSERT INTO tasks (id, username, date, project_id, data) VALUES (?, ?, ?, ?, ?) '
+                     'ON CONFLICT(id) DO UPDATE SET username = excluded.username, date = excluded.date, '
+                     'project_id = excluded.project_id, data = excluded.data',
+                     (task.get('id'), task.get('username'), task.get('date'), task.get('project_id'), json.dumps(task)))
+
+    def _insert_task(self, conn, task):
+        # Plain INSERT: a timestamp id another worker already used is bumped, never overwritten
+        while True:
+            try:
+                conn.execute('INSERT INTO tasks (id, username, date, project_id, data) VALUES (?, ?, ?, ?, ?)',
+                             (task.get('id'), task.get('username'), task.get('date'), task.get('project_id'),
+                              json.dumps(task)))
+                return
+            except sqlite3.IntegrityError:
+                task['id'] = str(round(float(task['id']) + 0.000001, 6))
+
+    def get_user_tasks(self, username, date_str):
+        return self._query_tasks('username = ? AND date = ?', (username, date_str))
+
+    def add_task(self, username, title, date_str, project_id=None):
+        new_task = _new_task(username, title, date_str, project_id)
+        with self._transaction() as conn:
+            self._insert_task(conn, new_task)
+        return new_task
+
+    def update_task_status(self, task_id, completed):
+        return self.update_task(task_id, {'completed': completed})
+
+    def update_task(self, task_id, updates):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT data FROM tasks WHERE id = ?', (task_id,)).fetchone()
+            if not row:
+                return False
+            task = json.loads(row[0])
+            task.update(updates)
+            conn.execute('UPDATE tasks SET username = ?, date = ?, project_id = ?, data = ? WHERE id = ?',
+                         (task.get('username'), task.get('date'), task.get('project_id'), json.dumps(task), task_id))
+            return True
+
+    def delete_task(self, task_id):
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,)).rowcount > 0
+
+    def apply_task_batch(self, new_tasks=None, updates=None, deletes=None):
+        """Same contract as Database.apply_task_batch, applied in one transaction."""
+        with self._transaction() as conn:
+            ids = list(updates or {}) + list(deletes or [])
+            existing = {}
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = conn.execute(f"SELECT id, data FROM tasks WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                existing.update((tid, json.loads(d)) for tid, d in rows)
+            records, created = _task_batch_records(new_tasks, updates, deletes, existing)
+            for r in records:
+                if r['op'] == 'add':
+                    self._insert_task(conn, r['task'])
+                elif r['op'] == 'update':
+                    task = existing[r['id']]
+                    task.update(r['updates'])
+                    self._put_task(conn, task)
+                else:
+                    conn.execute('DELETE FROM tasks WHERE id = ?', (r['id'],))
+        return created
+
+    def get_all_tasks_by_date(self, date_str):
+        return self._query_tasks('date = ?', (date_str,))
+
+    def get_tasks_by_project(self, project_id):
+        return self._query_tasks('project_id = ?', (project_id,))
+
+    def delete_task_by_project_and_user(self, project_id, username):
+        with self._transaction() as conn:
+            cur = conn.execute('DELETE FROM tasks WHERE project_id = ? AND username = ?', (project_id, username))
+            return cur.rowcount > 0
+
+    def get_task_stats(self, date_from, date_to, group_by='user'):
+        """Same contract as Database.get_task_stats, read from the trigger-maintained aggregates."""
+        rows = self._conn().execute(
+            'SELECT key, date, total, completed FROM task_daily_stats '
+            'WHERE grp = ? AND date BETWEEN ? AND ? AND total > 0 ORDER BY date',
+            (group_by, date_from, date_to)).fetchall()
+        return _task_stats_result(rows)
+
+    # --- Projects ---
+    def get_projects(self):
+        rows = self._conn().execute('SELECT data FROM projects ORDER BY rowid').fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get_project(self, project_id):
+        row = self._conn().execute('SELECT data FROM projects WHERE id = ?', (project_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_project(self, project_data):
+        with self._transaction() as conn:
+            # Upsert keeps the original rowid, so board order is preserved on update
+            conn.execute('INSERT INTO projects (id, data) VALUES (?, ?) '
+                         'ON CONFLICT(id) DO UPDATE SET data = excluded.data',
+                         (project_data['id'], json.dumps(project_data)))
+        return True
+
+    def archive_project(self, project_id):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT data FROM projects WHERE id = ?', (project_id,)).fetchone()
+            if not row:
+                return False
+            p = json.loads(row[0])
+            p['archived'] = True
+            p['archived_at'] = datetime.datetime.now().isoformat()
+            conn.execute('UPDATE projects SET data = ? WHERE id = ?', (json.dumps(p), project_id))
+            return True
+
+    def delete_project(self, project_id):
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM projects WHERE id = ?', (project_id,)).rowcount > 0
+
+
+def migrate_json_to_sqlite(sqlite_db, data_dir=None):
+    """
+    One-shot import of users.json, the daily task partitions (+ pending log) and projects.json
+    into an SQLiteDatabase. Does nothing once the import has been recorded in `meta`.
+    """
+    with sqlite_db._transaction() as conn:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            return False
+
+        # Read-only, so switching back to DB_BACKEND=json finds the JSON store unchanged
+        source = Database(data_dir=data_dir, read_only=True)
+        users = source.load_users() if os.path.exists(source.users_file) else DEFAULT_USERS
+        conn.executemany('INSERT OR IGNORE INTO users (username, data) VALUES (?, ?)',
+                         [(u, json.dumps(d)) for u, d in users.items()])
+        with source._lock:
+            source._refresh_tasks()
+            for task in source._all_tasks():
+                sqlite_db._put_task(conn, task)
+        conn.executemany('INSERT OR IGNORE INTO projects (id, data) VALUES (?, ?)',
+                         [(p['id'], json.dumps(p)) for p in source.get_projects()])
+        conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                     (datetime.datetime.now().isoformat(),))
+        return True
+
 
-db = Database()
+db = SQLiteDatabase() if DB_BACKEND == 'sqlite' else Database()
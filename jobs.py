@@ -0,0 +1,255 @@
+import datetime
+import io
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import pool_utils
+from database import DATA_DIR
+from result_store import result_store
+from hs_utils import HSCodeExtractor
+from toyota_utils import ToyotaTrainProcessor
+from atr_utils import ATRExtractor
+from toyota_damage_utils import ToyotaDamageProcessor, extract_pdf_text
+from toyota_dvh_utils import ToyotaVesselDVHHelper
+from t2l_batch import generate_t2l_batch
+
+JOBS_DIR = os.environ.get('BLG_JOBS_DIR', os.path.join(DATA_DIR, 'jobs'))
+JOB_WORKERS = int(os.environ.get('BLG_JOB_WORKERS', min(4, os.cpu_count() or 1)))
+JOB_RETENTION_SECONDS = 24 * 3600
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+ZIP_MIMETYPE = 'application/zip'
+
+
+class JobError(Exception):
+    """Invalid input detected by a job; reported to the client as a 400."""
+
+
+# --- Job functions ---
+# Module-level so they can be pickled into the process pool. They also run inline
+# for synchronous requests. A job returns either {'json': payload} or
+# {'file': bytes, 'download_name': ..., 'mimetype': ...}.
+
+def damage_report_job(manifest_bytes, pdf_text, vin_order_text='', manual_damages_text='', pdf_bytes=None,
+                      manifest_filename=''):
+    processor = ToyotaDamageProcessor()
+
+    if pdf_bytes:
+        report_progress(0.05, 'Branje PDF')
+        try:
+            pdf_text = extract_pdf_text(pdf_bytes)
+        except ValueError as e:
+            raise JobError(str(e))
+
+    report_progress(0.2, 'Branje PDF teksta')
+    damage_data = processor.process_raw_text(pdf_text)
+
+    # Manifest rows come from .xlsx or delimited text
+    manifest_rows = processor.read_manifest_rows(manifest_bytes, manifest_filename)
+    vin_order_list = [v.strip() for v in vin_order_text.split('\n') if v.strip()] if vin_order_text else None
+
+    report_progress(0.4, 'Urejanje manifesta')
+    output_rows, dmg_idx = processor.process_manifest_reorder(manifest_rows, damage_data, vin_order_list=vin_order_list)
+    if manual_damages_text:
+        processor.inject_manual_damages(output_rows, manual_damages_text)
+
+    report_progress(0.7, 'Izvoz Excel')
+    buf = processor.export_excel(output_rows, dmg_idx)
+    return {'file': buf.getvalue(), 'download_name': 'Toyota_Damage_Report.xlsx', 'mimetype': XLSX_MIMETYPE}
+
+
+def dvh_process_job(master_bytes, ua_bytes, vessel, eta):
+    helper = ToyotaVesselDVHHelper()
+
+    report_progress(0.1, 'Branje manifesta')
+    ua = io.BytesIO(ua_bytes) if ua_bytes else None
+    data = helper.process_manifest(io.BytesIO(master_bytes), vessel, eta, ua_path_or_obj=ua)
+    if 'error' in data:
+        raise JobError(data['error'])
+
+    # Workbooks go to the result store; the response only carries download URLs
+    results = []
+    for i, key in enumerate(['PL', 'CZ', 'UA']):
+        report_progress(0.5 + 0.15 * i, f'Izvoz {key}')
+        buf = helper.export_excel_bytes(data.get(key), key)
+        if buf:
+            digest = result_store.put(buf)
+            filename = f"{datetime.datetime.now().strftime('%Y%m%d')} - {vessel} - {key}.xlsx"
+            results.append({
+                'name': filename,
+                'url': result_store.download_url(digest, filename)
+            })
+    return {'json': {'results': results}}
+
+
+def train_job(odstrel_bytes, plan_bytes, is_t1=False, export=False):
+    processor = ToyotaTrainProcessor()
+    report_progress(0.1, 'Združevanje')
+    df_wag = processor.process_phase_1(odstrel_bytes, plan_bytes, is_t1=is_t1)
+    report_progress(0.7, 'Statistika')
+    stats = processor.process_phase_2(df_wag)
+    if export:
+        report_progress(0.8, 'Izvoz Excel')
+        buf = processor.export_excel(df_wag, stats)
+        filename = f"WAG_eTL_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+        return {'file': buf.getvalue(), 'download_name': filename, 'mimetype': XLSX_MIMETYPE}
+    return {'json': stats}
+
+
+def train_batch_job(odstrel_files, plan_bytes, is_t1=False):
+    report_progress(0.1, f'Združevanje {len(odstrel_files)} vlakov')
+    return {'json': ToyotaTrainProcessor().process_trains(odstrel_files, plan_bytes, is_t1=is_t1)}
+
+
+def t2l_batch_job(brand, stock, entries):
+    report_progress(0.1, f'Generiranje {len(entries)} T2L')
+    try:
+        buf = generate_t2l_batch(brand, stock, entries)
+    except ValueError as e:
+        raise JobError(str(e))
+    filename = f"T2L_{brand.upper()}_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+    return {'file': buf.getvalue(), 'download_name': filename, 'mimetype': ZIP_MIMETYPE}
+
+
+def atr_job(file_bytes, filename):
+    extractor = ATRExtractor()
+    raw_text = extractor.extract_text(file_bytes, filename)
+    data = extractor.analyze_content(raw_text)
+    return {'json': {'filename': filename, 'atr': data['atr'], 'invoice': data['invoice']}}
+
+
+def hs_job(file_bytes, filename):
+    # process_file handles ZIP or Excel seamlessly
+    return {'json': {'results': HSCodeExtractor().process_file(file_bytes, filename)}}
+
+
+# --- Progress reporting (inside a worker process) ---
+_current_job = None # (jobs_dir, job_id) while a pooled job runs
+
+def report_progress(fraction, message=''):
+    """Records job progress; a no-op when the job function runs inline."""
+    if _current_job is None:
+        return
+    jobs_dir, job_id = _current_job
+    _update_meta(jobs_dir, job_id, progress=round(fraction, 2), message=message)
+
+
+def _meta_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f'{job_id}.json')
+
+def _result_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f'{job_id}.bin')
+
+def _read_meta(jobs_dir, job_id):
+    try:
+        with open(_meta_path(jobs_dir, job_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _json_default(value):
+    """JSON for numpy values that pandas-based job results carry (e.g. int64 sums)."""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _write_meta(jobs_dir, job_id, meta):
+    tmp = f"{_meta_path(jobs_dir, job_id)}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, default=_json_default)
+    os.replace(tmp, _meta_path(jobs_dir, job_id))
+
+def _update_meta(jobs_dir, job_id, **changes):
+    meta = _read_meta(jobs_dir, job_id) or {'id': job_id}
+    meta.update(changes)
+    _write_meta(jobs_dir, job_id, meta)
+    return meta
+
+
+def _run_job(jobs_dir, job_id, fn, args):
+    """Pool entry point: runs the job and stores its result next to the job's status file."""
+    global _current_job
+    _current_job = (jobs_dir, job_id)
+    pool_utils.job_worker = True # the job has this process; no nested pools
+    _update_meta(jobs_dir, job_id, status='running', started_at=time.time())
+    try:
+        result = fn(*args)
+        if 'file' in result:
+            with open(_result_path(jobs_dir, job_id), 'wb') as f:
+                f.write(result['file'])
+            done = {'result_type': 'file', 'download_name': result['download_name'], 'mimetype': result['mimetype']}
+        else:
+            done = {'result_type': 'json', 'result': result['json']}
+        _update_meta(jobs_dir, job_id, status='done', progress=1, finished_at=time.time(), **done)
+    except JobError as e:
+        _update_meta(jobs_dir, job_id, status='error', error=str(e), error_code=400, finished_at=time.time())
+    except Exception as e:
+        print(f"JOB ERROR ({job_id}): {e}")
+        _update_meta(jobs_dir, job_id, status='error', error=str(e), error_code=500, finished_at=time.time())
+    finally:
+        _current_job = None
+        pool_utils.job_worker = False
+
+
+class JobManager:
+    """
+    Runs job functions in a bounded process pool. Job status and results are files in
+    jobs_dir, so whichever web worker receives the status poll can answer it.
+    """
+    def __init__(self, jobs_dir=None, max_workers=None):
+        self.jobs_dir = jobs_dir or JOBS_DIR
+        self.max_workers = max_workers or JOB_WORKERS
+        self._pool = None
+        if not os.path.exists(self.jobs_dir):
+            os.makedirs(self.jobs_dir)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def submit(self, kind, fn, *args, owner=None):
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        _write_meta(self.jobs_dir, job_id, {
+            'id': job_id, 'kind': kind, 'owner': owner, 'status': 'queued',
+            'progress': 0, 'message': '', 'created_at': time.time()
+        })
+        future = self._executor().submit(_run_job, self.jobs_dir, job_id, fn, args)
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return job_id
+
+    def _on_done(self, job_id, future):
+        # _run_job records its own errors; this catches a crashed worker process
+        error = future.exception()
+        if error is not None:
+            if isinstance(error, BrokenProcessPool):
+                self._pool = None # start a fresh pool on the next submit
+            _update_meta(self.jobs_dir, job_id, status='error', error=str(error),
+                         error_code=500, finished_at=time.time())
+
+    def get(self, job_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+            return None
+        return _read_meta(self.jobs_dir, job_id)
+
+    def result_file(self, job_id):
+        return _result_path(self.jobs_dir, job_id)
+
+    def cleanup(self):
+        """Deletes status and result files of jobs finished more than JOB_RETENTION_SECONDS ago."""
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for name in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,17 @@
+import os
+
+MAX_POOL_WORKERS = 4 # več procesov se le še tepe za CPU in pomnilnik
+
+# True v procesu, ki izvaja job iz jobs.JobManager (nastavi ga jobs._run_job)
+job_worker = False
+
+
+def pool_workers(workers, tasks):
+    """
+    Število procesov za ProcessPoolExecutor nad `tasks` nalogami: workers (privzeto število CPU),
+    največ MAX_POOL_WORKERS in ne več, kot je nalog. Znotraj joba vedno 1, ker job že teče
+    v svojem procesu. Rezultat <= 1 pomeni: obdelaj zaporedno, brez poola.
+    """
+    if job_worker:
+        return 1
+    return min(workers or os.cpu_count() or 1, MAX_POOL_WORKERS, tasks)
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import re
+import time
+import urllib.parse
+
+from database import DATA_DIR
+
+RESULTS_DIR = os.environ.get('BLG_RESULTS_DIR', os.path.join(DATA_DIR, 'results'))
+RESULT_TTL_SECONDS = int(os.environ.get('BLG_RESULT_TTL', 24 * 3600))
+RESULT_URL = '/api/results/{digest}'
+EVICT_INTERVAL_SECONDS = 600
+
+
+class ExpiringStore:
+    """Directory of files that are evicted once their mtime is older than the TTL."""
+    def __init__(self, store_dir, ttl):
+        self.store_dir = store_dir
+        self.ttl = ttl
+        self._last_evict = 0
+
+    def evict(self, force=False):
+        """Deletes expired files; without force at most once per EVICT_INTERVAL_SECONDS."""
+        now = time.time()
+        if not force and now - self._last_evict < EVICT_INTERVAL_SECONDS:
+            return
+        self._last_evict = now
+        if not os.path.exists(self.store_dir):
+            return
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            try:
+                if os.path.getmtime(path) < now - self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class ResultStore(ExpiringStore):
+    """
+    Generated files stored under the sha256 of their content. Identical outputs share
+    one file; files not written again within the TTL are evicted.
+    Used from web workers and job processes alike, so all state lives on disk.
+    """
+    def __init__(self, store_dir=None, ttl=None):
+        super().__init__(store_dir or RESULTS_DIR, RESULT_TTL_SECONDS if ttl is None else ttl)
+
+    def put(self, fileobj):
+        """Streams a file-like object into the store and returns its digest."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        sha = hashlib.sha256()
+        tmp = os.path.join(self.store_dir, f".tmp.{os.getpid()}.{time.time_ns()}")
+        with open(tmp, 'wb') as f:
+            for chunk in iter(lambda: fileobj.read(1024 * 1024), b''):
+                sha.update(chunk)
+                f.write(chunk)
+        digest = sha.hexdigest()
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.remove(tmp)
+            os.utime(target) # restart its TTL
+        else:
+            os.replace(tmp, target)
+        self.evict()
+        return digest
+
+    def path(self, digest):
+        if not re.fullmatch(r'[0-9a-f]{64}', digest or ''):
+            return None
+        return os.path.join(self.store_dir, digest)
+
+    def exists(self, digest):
+        path = self.path(digest)
+        return path is not None and os.path.exists(path)
+
+    def download_url(self, digest, name):
+        return RESULT_URL.format(digest=digest) + '?' + urllib.parse.urlencode({'name': name})
+
+
+result_store = ResultStore()
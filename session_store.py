@@ -0,0 +1,123 @@
+import json
+import os
+import secrets
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from database import DATA_DIR, SQLiteStore
+
+SESSION_FILE = os.environ.get('BLG_SESSION_DB', os.path.join(DATA_DIR, 'sessions.db'))
+SESSION_REFRESH_SECONDS = 3600 # sliding expiry is rewritten at most once per hour
+SESSION_PURGE_SECONDS = 600
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class SQLiteSessionStore(SQLiteStore):
+    """Session payloads keyed by an opaque id, with an absolute expiry time."""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires);
+    """
+
+    def __init__(self, db_path=None):
+        self._last_purge = 0
+        super().__init__(db_path or SESSION_FILE)
+
+    def get(self, sid):
+        """Returns (data, expires) or (None, None) if the session is unknown or expired."""
+        row = self._conn().execute('SELECT data, expires FROM sessions WHERE id = ? AND expires > ?',
+                                   (sid, time.time())).fetchone()
+        if not row:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def set(self, sid, data, expires):
+        self._conn().execute('INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?) '
+                             'ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires = excluded.expires',
+                             (sid, json.dumps(data), expires))
+        self.purge_expired()
+
+    def delete(self, sid):
+        self._conn().execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+    def purge_expired(self, force=False):
+        now = time.time()
+        if force or now - self._last_purge > SESSION_PURGE_SECONDS:
+            self._last_purge = now
+            self._conn().execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid or _new_sid()
+        self.new = new
+        self.expires = expires
+        self.stale_sid = None
+        self.modified = False
+
+    def regenerate(self):
+        """New id for the same data (call on login so a pre-login id cannot be reused)."""
+        if not self.new:
+            self.stale_sid = self.sid
+        self.sid = _new_sid()
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Keeps session data on the server; the cookie only carries a random session id,
+    so requests no longer sign and ship the session payload back and forth.
+    """
+    def __init__(self, store=None):
+        self.store = store or SQLiteSessionStore()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data, expires = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid, expires=expires)
+        return ServerSideSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.stale_sid:
+            self.store.delete(session.stale_sid)
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+            if session.modified:
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        expires = time.time() + app.permanent_session_lifetime.total_seconds()
+        if session.modified or session.expires is None or expires - session.expires > SESSION_REFRESH_SECONDS:
+            self.store.set(session.sid, dict(session), expires)
+
+        if session.new or session.stale_sid or self.should_set_cookie(app, session):
+            response.set_cookie(name, session.sid,
+                                expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app),
+                                domain=domain, path=path,
+                                secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app))
@@ -104,3 +104,23 @@ function applyLanguage(lang) {
     const langLabel = document.getElementById('lang-label');
     if (langLabel) langLabel.textContent = lang === 'en' ? 'English' : 'Slovenian';
 }
+
+
+// --- Background Jobs ---
+// Posts the form as a background job (async=1), polls /api/jobs/<id> until it finishes
+// and resolves with the result response, so callers handle it like a plain fetch().
+async function fetchJob(url, options = {}, onProgress = null) {
+    const body = options.body instanceof FormData ? options.body : new FormData();
+    body.set('async', '1');
+    const res = await fetch(url, { ...options, method: 'POST', body });
+    if (res.status !== 202) return res;
+
+    const job = await res.json();
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const status = await (await fetch(job.status_url)).json();
+        if (onProgress) onProgress(status.progress || 0, status.message || '');
+        if (status.status === 'done' || status.status === 'error' || !status.status) break;
+    }
+    return fetch(job.result_url);
+}
@@ -0,0 +1,96 @@
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from database import DATA_DIR
+from result_store import ExpiringStore
+
+try:
+    import pyarrow # noqa: F401 (potreben za Feather)
+    STOCK_FORMAT = 'feather'
+except ImportError: # brez pyarrow se tabela shrani kot pickle
+    STOCK_FORMAT = 'pkl'
+
+STOCK_DIR = os.environ.get('BLG_STOCK_DIR', os.path.join(DATA_DIR, 'stock'))
+STOCK_TTL_SECONDS = int(os.environ.get('BLG_STOCK_TTL', 7 * 24 * 3600))
+STOCK_MEMORY_SIZE = int(os.environ.get('BLG_STOCK_CACHE_SIZE', 4))
+
+
+class StockCache(ExpiringStore):
+    """
+    Parsed stock CSV tables (load_stock) keyed by the sha256 of the uploaded file and loader kind.
+    Tables are stored on disk in a columnar format, so every web worker can reuse
+    them by id; the most recent ones are also kept in memory.
+    Cached tables are shared, so callers must not modify them.
+    """
+    def __init__(self, store_dir=None, ttl=None, memory_size=None):
+        super().__init__(store_dir or STOCK_DIR, STOCK_TTL_SECONDS if ttl is None else ttl)
+        self.memory_size = STOCK_MEMORY_SIZE if memory_size is None else memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, csv_bytes, loader, kind=''):
+        """
+        Parses csv_bytes with loader (only if not cached yet) and returns the stock id.
+        Loaders that keep different columns must pass a different kind.
+        """
+        digest = hashlib.sha256(kind.encode() + b'\0' + csv_bytes).hexdigest()
+        if self.get(digest) is not None:
+            return digest
+
+        df = loader(io.BytesIO(csv_bytes))
+        os.makedirs(self.store_dir, exist_ok=True)
+        path = os.path.join(self.store_dir, f"{digest}.{STOCK_FORMAT}")
+        tmp = f"{path}.{os.getpid()}.{time.time_ns()}.tmp"
+        if STOCK_FORMAT == 'feather':
+            df.to_feather(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)
+        self._remember(digest, df)
+        self.evict()
+        return digest
+
+    def get(self, stock_id):
+        """Returns the cached table or None if the id is unknown or expired."""
+        if not re.fullmatch(r'[0-9a-f]{64}', stock_id or ''):
+            return None
+        with self._lock:
+            df = self._memory.get(stock_id)
+            if df is not None:
+                self._memory.move_to_end(stock_id)
+
+        path = self.path(stock_id)
+        try:
+            os.utime(path) # restart its TTL
+        except (TypeError, OSError): # evicted (or never stored)
+            with self._lock:
+                self._memory.pop(stock_id, None)
+            return None
+        if df is None:
+            df = pd.read_feather(path) if path.endswith('.feather') else pd.read_pickle(path)
+            self._remember(stock_id, df)
+        return df
+
+    def path(self, stock_id):
+        for ext in ('feather', 'pkl'):
+            path = os.path.join(self.store_dir, f"{stock_id}.{ext}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _remember(self, stock_id, df):
+        with self._lock:
+            self._memory[stock_id] = df
+            self._memory.move_to_end(stock_id)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
+stock_cache = StockCache()
@@ -0,0 +1,85 @@
+import io
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from vw_t2l_utils import VWAttListaHelper
+from toyota_t2l_utils import ToyotaAttListaHelper
+from pool_utils import pool_workers
+
+# Brand -> (helper, ime datoteke kot pri posameznem T2L)
+T2L_HELPERS = {
+    'vw': (VWAttListaHelper, "ATT.LISTA {count}X .xlsx"),
+    'toyota': (ToyotaAttListaHelper, "ATT.LISTA {count}X (TOYOTA).xlsx"),
+}
+
+# Stock tabela v pool procesu; pošlje se enkrat na proces (initializer), ne za vsak SWB
+_worker_stock = None
+
+def _init_worker(stock):
+    global _worker_stock
+    _worker_stock = stock
+
+def _t2l_worker(brand, entry):
+    return t2l_workbook(brand, _worker_stock, entry)
+
+
+def _lines(value):
+    """Seznam ali tekst (ena vrednost na vrstico) -> očiščen seznam."""
+    if isinstance(value, str):
+        value = value.split('\n')
+    return [str(x).strip() for x in value or [] if str(x).strip()]
+
+
+def parse_entries(entries):
+    """Preveri vnose paketa: [{'swb': ..., 'chassis': [...] ali tekst, 'diz': [...] ali tekst}]."""
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Ni SWB vnosov.")
+    parsed = []
+    for i, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Vnos {i} ni veljaven.")
+        swb = str(entry.get('swb') or '').strip()
+        chassis = _lines(entry.get('chassis'))
+        if not swb or not chassis:
+            raise ValueError(f"Vnos {i}: manjka SWB ali seznam šasij.")
+        parsed.append({'swb': swb, 'chassis': chassis, 'diz': _lines(entry.get('diz'))})
+    return parsed
+
+
+def t2l_workbook(brand, stock, entry):
+    """En T2L (ime, xlsx bytes) iz že prebrane stock tabele (load_stock)."""
+    helper_cls, name = T2L_HELPERS[brand]
+    helper = helper_cls()
+    try:
+        data_pack = helper.process_stock(stock, entry['chassis'], entry['diz'], entry['swb'])
+    except ValueError as e:
+        raise ValueError(f"SWB {entry['swb']}: {e}")
+    filename = f"{entry['swb']} - " + name.format(count=len(entry['chassis']))
+    return re.sub(r'[\\/:*?"<>|]', '_', filename), helper.export_to_excel_buffer(data_pack).getvalue()
+
+
+def generate_t2l_batch(brand, stock, entries, workers=None):
+    """
+    Več T2L list iz iste stock tabele, vzporedno v procesih; vrne ZIP (BytesIO).
+    Datoteke so v ZIP-u v vrstnem redu vnosov.
+    """
+    entries = parse_entries(entries)
+    workers = pool_workers(workers, len(entries))
+    if workers <= 1:
+        workbooks = [t2l_workbook(brand, stock, entry) for entry in entries]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stock,)) as pool:
+            workbooks = list(pool.map(_t2l_worker, [brand] * len(entries), entries))
+
+    output = io.BytesIO()
+    names = {}
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for filename, content in workbooks:
+            # Isti SWB dvakrat -> "(2)" pred končnico
+            names[filename] = names.get(filename, 0) + 1
+            if names[filename] > 1:
+                filename = f"{filename[:-5].rstrip()} ({names[filename]}).xlsx"
+            zf.writestr(filename, content)
+    output.seek(0)
+    return output
@@ -0,0 +1,177 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# Stores created when app is imported go to a temporary directory
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault('BLG_SESSION_DB', os.path.join(_tmp, 'sessions.db'))
+os.environ.setdefault('BLG_JOBS_DIR', os.path.join(_tmp, 'jobs'))
+os.environ.setdefault('BLG_RESULTS_DIR', os.path.join(_tmp, 'results'))
+os.environ.setdefault('BLG_STOCK_DIR', os.path.join(_tmp, 'stock'))
+
+import app as app_module
+from database import Database
+from session_store import ServerSideSessionInterface, SQLiteSessionStore
+from jobs import JobManager, JobError
+from test_toyota_train import to_xlsx
+
+
+# Job functions must be module-level to reach the process pool
+def echo_job(value):
+    return {'json': {'value': value}}
+
+def invalid_job():
+    raise JobError('Manjka datoteka.')
+
+def numpy_job():
+    return {'json': {'total': np.int64(3000), 'share': np.float64(0.5), 'weights': np.array([1000, 2000])}}
+
+
+def tearDownModule():
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+class AppTestCase(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self._db = app_module.db
+        self._sessions = app_module.app.session_interface
+        app_module.db = Database(data_dir=self.data_dir)
+        app_module.app.session_interface = ServerSideSessionInterface(
+            SQLiteSessionStore(os.path.join(self.data_dir, 'sessions.db')))
+        app_module.app.config['TESTING'] = True
+        self.client = app_module.app.test_client()
+
+    def tearDown(self):
+        app_module.db = self._db
+        app_module.app.session_interface = self._sessions
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def login(self, username, password, client=None):
+        res = (client or self.client).post('/login', data={'username': username, 'password': password})
+        self.assertEqual(res.status_code, 302)
+
+
+class TestTaskStatsRoute(AppTestCase):
+    def test_requires_admin(self):
+        self.assertEqual(self.client.get('/api/admin/task_stats').status_code, 302) # login page
+        self.login('operativa', 'op')
+        self.assertEqual(self.client.get('/api/admin/task_stats').status_code, 403)
+
+    def test_default_range_is_today(self):
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        db = app_module.db
+        done = db.add_task('operativa', 'A', today)
+        db.update_task(done['id'], {'completed': True})
+        db.add_task('operativa', 'B', today)
+        db.add_task('operativa', 'C', '2000-01-01')
+
+        self.login('admin', 'admin')
+        res = self.client.get('/api/admin/task_stats')
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual((data['from'], data['to'], data['group_by']), (today, today, 'user'))
+        self.assertEqual([(g['key'], g['total'], g['completed']) for g in data['groups']], [('operativa', 2, 1)])
+
+        res = self.client.get('/api/admin/task_stats?from=2000-01-01&to=2000-01-31&group_by=project')
+        self.assertEqual([(g['key'], g['total']) for g in res.get_json()['groups']], [('', 1)])
+
+    def test_bad_arguments(self):
+        self.login('admin', 'admin')
+        res = self.client.get('/api/admin/task_stats?group_by=title')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('group_by', res.get_json()['error'])
+        self.assertEqual(self.client.get('/api/admin/task_stats?from=18.01.2026').status_code, 400)
+
+
+class TestJobRoutes(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self._job_manager = app_module.job_manager
+        app_module.job_manager = JobManager(jobs_dir=os.path.join(self.data_dir, 'jobs'), max_workers=1)
+
+    def tearDown(self):
+        pool = app_module.job_manager._pool
+        if pool is not None:
+            pool.shutdown()
+        app_module.job_manager = self._job_manager
+        super().tearDown()
+
+    def wait_for(self, job_id):
+        for _ in range(100):
+            status = self.client.get(f'/api/jobs/{job_id}').get_json()
+            if status['status'] in ('done', 'error'):
+                return status
+            time.sleep(0.05)
+        self.fail('job did not finish')
+
+    def test_submit_status_result(self):
+        self.login('operativa', 'op')
+        job_id = app_module.job_manager.submit('echo', echo_job, 42, owner='operativa')
+        status = self.wait_for(job_id)
+        self.assertEqual((status['kind'], status['status'], status['progress']), ('echo', 'done', 1))
+        res = self.client.get(status['result_url'])
+        self.assertEqual((res.status_code, res.get_json()), (200, {'value': 42}))
+
+    def test_numpy_result(self):
+        self.login('operativa', 'op')
+        job_id = app_module.job_manager.submit('numpy', numpy_job, owner='operativa')
+        self.assertEqual(self.wait_for(job_id)['status'], 'done')
+        res = self.client.get(f'/api/jobs/{job_id}/result')
+        self.assertEqual(res.get_json(), {'total': 3000, 'share': 0.5, 'weights': [1000, 2000]})
+
+    def test_other_users_job_is_forbidden(self):
+        job_id = app_module.job_manager.submit('echo', echo_job, 1, owner='admin')
+        self.login('operativa', 'op')
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/result').status_code, 403)
+
+    def test_job_error_is_bad_request(self):
+        self.login('operativa', 'op')
+        job_id = app_module.job_manager.submit('invalid', invalid_job, owner='operativa')
+        self.assertEqual(self.wait_for(job_id)['error'], 'Manjka datoteka.')
+        res = self.client.get(f'/api/jobs/{job_id}/result')
+        self.assertEqual((res.status_code, res.get_json()['error']), (400, 'Manjka datoteka.'))
+
+    def test_unknown_job(self):
+        self.login('operativa', 'op')
+        self.assertEqual(self.client.get(f'/api/jobs/{"0" * 32}').status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/not-a-job/result').status_code, 404)
+
+
+class TestDamageReportRoute(AppTestCase):
+    def test_template_fields(self):
+        self.login('operativa', 'op')
+        res = self.client.post('/api/toyota/damage-report', data={
+            'pdf_file': (io.BytesIO(b'not a pdf'), 'inspection.pdf'),
+            'manifest': (io.BytesIO(b'VIN;MODEL\n'), 'manifest.csv'),
+        })
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('PDF', res.get_json()['error'])
+
+
+class TestProcessTrainsRoute(AppTestCase):
+    def test_integer_weights_return_json(self):
+        plan = to_xlsx(pd.DataFrame({'VIN': ['JTDKB20U803456789', 'SB1KV58E50F012345'], 'TEZA': [1000, 2000]}))
+        trains = [to_xlsx(pd.DataFrame({'VIN': [vin], 'VAGON': [wagon]}))
+                  for vin, wagon in (('JTDKB20U803456789', '4291'), ('SB1KV58E50F012345', '4371'))]
+        self.login('operativa', 'op')
+        res = self.client.post('/api/toyota/process-trains', data={
+            'plan': (io.BytesIO(plan), 'plan.xlsx'),
+            'odstrel': [(io.BytesIO(t), f'train{i}.xlsx') for i, t in enumerate(trains, start=1)],
+        })
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(data['summary']['stats']['total_weight'], 3000)
+        self.assertEqual(data['trains']['train2.xlsx']['wagons'][0]['WEIGHT'], 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import pandas as pd
+
+import csv_ingest
+from csv_ingest import parse_weights, read_csv_columns, sniff_delimiter, sniff_encoding
+
+
+class TestCsvIngest(unittest.TestCase):
+    def test_sniffing(self):
+        self.assertEqual(sniff_delimiter('VIN,DEST,WEIGHT\nA,B,1\n'), ',')
+        self.assertEqual(sniff_delimiter('VIN;WEIGHT\nA;1,5\nB;2,5\n'), ';')
+        self.assertEqual(sniff_delimiter('VIN\tDAMAGE\nA\tdent, scratch\n', default='\t'), '\t')
+        self.assertEqual(sniff_delimiter('VIN\nA\n', default='\t'), '\t')
+        self.assertEqual(sniff_encoding('ŠASIJA'.encode('cp1250')), 'cp1250')
+        self.assertEqual(sniff_encoding(b'\xef\xbb\xbfVIN'), 'utf-8-sig')
+
+    def test_selected_columns(self):
+        data = 'Vin ,Cilj,Opis,Teža\nA1,KOPER,x,1\nA2,ČRNA\n'.encode('cp1250')
+        df = read_csv_columns(data, select=lambda names: [n for n in names if n in ('VIN', 'TEŽA')])
+        self.assertEqual(list(df.columns), ['VIN', 'TEŽA'])
+        self.assertEqual(df['VIN'].tolist(), ['A1', 'A2'])
+
+    def test_engines_agree_on_bad_lines(self):
+        # Kratke vrstice se dopolnijo, predolge preskočijo (kot pd.read_csv on_bad_lines='skip')
+        data = b'VIN;A;WEIGHT\n1;2;3\n4;5\n6;7;8;9\n10;11;12\n'
+        engine = csv_ingest.CSV_ENGINE
+        try:
+            for csv_ingest.CSV_ENGINE in ('pyarrow', 'c'):
+                df = read_csv_columns(data, select=lambda names: ['VIN', 'A'])
+                self.assertEqual(df['VIN'].tolist(), ['1', '4', '10'])
+        finally:
+            csv_ingest.CSV_ENGINE = engine
+
+    def test_parse_weights(self):
+        weights = pd.Series(['1500', '1200,7', 'abc', None, '1_000', ' -3.9 ', 'inf'], dtype=object)
+        self.assertEqual(parse_weights(weights).tolist(), [1500, 1200, 0, 0, 1000, -3, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,274 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from database import Database, SQLiteDatabase
+
+
+class TestDatabaseTasks(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.db = Database(data_dir=self.data_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_indexed_lookups(self):
+        t1 = self.db.add_task('admin', 'A', '2026-01-18', project_id='p1')
+        t2 = self.db.add_task('operativa', 'B', '2026-01-18', project_id='p1')
+        self.db.add_task('admin', 'C', '2026-01-19')
+
+        self.assertEqual([t['title'] for t in self.db.get_user_tasks('admin', '2026-01-18')], ['A'])
+        self.assertEqual(len(self.db.get_all_tasks_by_date('2026-01-18')), 2)
+        self.assertEqual({t['id'] for t in self.db.get_tasks_by_project('p1')}, {t1['id'], t2['id']})
+
+        # Moving a task to another date re-indexes it
+        self.assertTrue(self.db.update_task(t1['id'], {'date': '2026-01-19', 'completed': True}))
+        self.assertEqual(self.db.get_user_tasks('admin', '2026-01-18'), [])
+        moved = [t for t in self.db.get_user_tasks('admin', '2026-01-19') if t['id'] == t1['id']]
+        self.assertTrue(moved[0]['completed'])
+
+        self.assertTrue(self.db.delete_task(t2['id']))
+        self.assertFalse(self.db.delete_task(t2['id']))
+        self.assertEqual([t['id'] for t in self.db.get_tasks_by_project('p1')], [t1['id']])
+
+    def test_apply_task_batch(self):
+        keep = self.db.add_task('admin', 'Keep', '2026-01-18', project_id='p1')
+        drop = self.db.add_task('operativa', 'Drop', '2026-01-18', project_id='p1')
+        log = os.path.join(self.data_dir, 'daily_logs.wal')
+        with open(log, 'rb') as f:
+            appended_before = f.read().count(b'\n')
+
+        created = self.db.apply_task_batch(
+            new_tasks=[{'username': u, 'title': 'New', 'date': '2026-01-18', 'project_id': 'p1', 'completed': True}
+                       for u in ('a', 'b', 'c')],
+            updates={keep['id']: {'title': 'Kept'}, 'missing': {'title': 'x'}},
+            deletes=[drop['id'], 'missing'])
+
+        self.assertEqual(len({t['id'] for t in created}), 3)
+        tasks = {t['username']: t for t in self.db.get_tasks_by_project('p1')}
+        self.assertEqual(sorted(tasks), ['a', 'admin', 'b', 'c'])
+        self.assertEqual(tasks['admin']['title'], 'Kept')
+        self.assertTrue(tasks['a']['completed'])
+        with open(log, 'rb') as f:
+            self.assertEqual(f.read().count(b'\n') - appended_before, 5)
+
+    def test_returned_tasks_are_copies(self):
+        self.db.add_task('admin', 'A', '2026-01-18')
+        self.db.get_user_tasks('admin', '2026-01-18')[0]['title'] = 'changed'
+        self.assertEqual(self.db.get_user_tasks('admin', '2026-01-18')[0]['title'], 'A')
+
+    def test_reloads_when_another_worker_compacts(self):
+        self.db.add_task('admin', 'A', '2026-01-18')
+        other = Database(data_dir=self.data_dir)
+        other.add_task('admin', 'Other worker', '2026-01-18')
+        self.assertTrue(other.compact_tasks())
+        self.assertEqual(sorted(t['title'] for t in self.db.get_user_tasks('admin', '2026-01-18')),
+                         ['A', 'Other worker'])
+
+    def test_append_waits_for_compaction_lock(self):
+        other = Database(data_dir=self.data_dir)
+        done = threading.Event()
+        writer = threading.Thread(target=lambda: (self.db.add_task('admin', 'A', '2099-01-18'), done.set()))
+        with other._task_log_lock(): # another worker is compacting
+            writer.start()
+            self.assertFalse(done.wait(0.2))
+        writer.join(5)
+        self.assertTrue(done.is_set())
+        self.assertEqual(len(other.get_user_tasks('admin', '2099-01-18')), 1)
+
+    def test_writes_append_to_log_and_compact(self):
+        partition = os.path.join(self.data_dir, 'daily_logs', '2099-01.json')
+        t1 = self.db.add_task('admin', 'A', '2099-01-18')
+        t2 = self.db.add_task('admin', 'B', '2099-01-18')
+        self.db.update_task_status(t1['id'], True)
+        self.db.delete_task(t2['id'])
+        self.assertFalse(os.path.exists(partition))
+
+        # A second worker sees the logged mutations and can append its own
+        other = Database(data_dir=self.data_dir)
+        self.assertEqual([(t['title'], t['completed']) for t in other.get_user_tasks('admin', '2099-01-18')],
+                         [('A', True)])
+        other.add_task('admin', 'C', '2099-01-18')
+        self.assertEqual(len(self.db.get_user_tasks('admin', '2099-01-18')), 2)
+
+        self.assertTrue(self.db.compact_tasks())
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, 'daily_logs.wal')))
+        with open(partition, encoding='utf-8') as f:
+            self.assertEqual(sorted(t['title'] for t in json.load(f)), ['A', 'C'])
+        self.assertEqual(len(other.get_user_tasks('admin', '2099-01-18')), 2)
+        self.assertEqual(len(Database(data_dir=self.data_dir).get_user_tasks('admin', '2099-01-18')), 2)
+
+    def test_closed_months_are_compressed_and_loaded_on_demand(self):
+        old = self.db.add_task('admin', 'Old', '2020-03-02', project_id='p1')
+        self.db.add_task('admin', 'Older', '2020-02-02', project_id='p2')
+        self.db.add_task('admin', 'Future', '2099-01-01', project_id='p1')
+        self.db.compact_tasks()
+        tasks_dir = os.path.join(self.data_dir, 'daily_logs')
+        self.assertEqual(sorted(os.listdir(tasks_dir)),
+                         ['2020-02.json.gz', '2020-03.json.gz', '2099-01.json', 'manifest.json'])
+
+        fresh = Database(data_dir=self.data_dir)
+        self.assertEqual(len(fresh.get_tasks_by_project('p1')), 2)
+        self.assertNotIn('2020-02', fresh._partitions)
+
+        # Editing a task in a closed month rewrites only that partition
+        self.assertTrue(fresh.update_task(old['id'], {'date': '2020-02-10'}))
+        self.assertEqual([t['title'] for t in fresh.get_all_tasks_by_date('2020-02-10')], ['Old'])
+        fresh.compact_tasks()
+        self.assertNotIn('2020-03.json.gz', os.listdir(tasks_dir))
+        self.assertEqual(len(Database(data_dir=self.data_dir).get_tasks_by_project('p1')), 2)
+
+    def test_task_stats_from_aggregates(self):
+        t1 = self.db.add_task('admin', '[Customs] Declaration', '2020-03-02', project_id='p1')
+        self.db.add_task('admin', 'Manual', '2020-03-03')
+        self.db.add_task('operativa', '[Customs] Other', '2099-01-01', project_id='p1')
+        self.db.update_task_status(t1['id'], True)
+        self.db.compact_tasks()
+
+        # Closed months are answered from the manifest without loading their partitions
+        fresh = Database(data_dir=self.data_dir)
+        stats = fresh.get_task_stats('2020-03-01', '2020-03-31', 'user')
+        self.assertNotIn('2020-03', fresh._partitions)
+        self.assertEqual([(g['key'], g['total'], g['completed'], g['rate']) for g in stats],
+                         [('admin', 2, 1, 0.5)])
+        self.assertEqual(stats[0]['days'], {'2020-03-02': [1, 1], '2020-03-03': [1, 0]})
+
+        # Unsaved mutations are reflected too
+        fresh.update_task(t1['id'], {'date': '2099-01-02'})
+        categories = fresh.get_task_stats('2020-01-01', '2099-12-31', 'category')
+        self.assertEqual([(g['key'], g['total'], g['completed']) for g in categories],
+                         [('', 1, 0), ('Customs', 2, 1)])
+        self.assertEqual([g['key'] for g in fresh.get_task_stats('2099-01-01', '2099-01-01', 'project')], ['p1'])
+
+    def test_migrates_single_file_store(self):
+        with open(os.path.join(self.data_dir, 'daily_logs.json'), 'w', encoding='utf-8') as f:
+            json.dump([{'id': '1', 'username': 'admin', 'date': '2020-01-05', 'title': 'Old', 'project_id': None},
+                       {'id': '2', 'username': 'admin', 'date': '2099-01-05', 'title': 'New', 'project_id': None}], f)
+        db = Database(data_dir=self.data_dir)
+        self.assertEqual([t['title'] for t in db.get_user_tasks('admin', '2020-01-05')], ['Old'])
+        self.assertEqual([t['title'] for t in db.get_user_tasks('admin', '2099-01-05')], ['New'])
+        self.assertTrue(os.path.exists(os.path.join(self.data_dir, 'daily_logs', '2020-01.json.gz')))
+
+
+class TestDatabaseCache(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.db = Database(data_dir=self.data_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_users_served_from_cache_until_file_changes(self):
+        user = self.db.get_user('admin')
+        user['role'] = 'changed'
+        self.assertEqual(self.db.get_user('admin')['role'], 'admin')
+
+        calls = []
+        original = self.db._read_users_file
+        self.db._read_users_file = lambda: calls.append(1) or original()
+        self.db.get_user('admin')
+        self.assertEqual(calls, [])
+
+        # Another worker edits users.json
+        users = json.load(open(self.db.users_file, encoding='utf-8'))
+        users['admin']['name'] = 'Renamed by other worker'
+        with open(self.db.users_file, 'w', encoding='utf-8') as f:
+            json.dump(users, f)
+        self.assertEqual(self.db.get_user('admin')['name'], 'Renamed by other worker')
+        self.assertEqual(calls, [1])
+
+    def test_projects_cache_follows_writes(self):
+        self.db.save_project({'id': 'p1', 'title': 'One'})
+        self.db.save_project({'id': 'p1', 'title': 'Renamed'})
+        self.assertEqual(self.db.get_project('p1')['title'], 'Renamed')
+        self.assertTrue(self.db.archive_project('p1'))
+        self.assertTrue(Database(data_dir=self.data_dir).get_project('p1')['archived'])
+        self.assertTrue(self.db.delete_project('p1'))
+        self.assertIsNone(self.db.get_project('p1'))
+
+
+class TestSQLiteDatabase(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        json_db = Database(data_dir=self.data_dir)
+        self.task = json_db.add_task('admin', 'From JSON', '2026-01-18', project_id='p1')
+        json_db.compact_tasks()
+        json_db._save_projects([{'id': 'p1', 'title': 'Project', 'status': 'todo', 'assignees': ['admin']}])
+        self.db = SQLiteDatabase(db_path=os.path.join(self.data_dir, 'blg.db'), data_dir=self.data_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_migrates_json_once(self):
+        self.assertEqual(self.db.get_user('admin')['role'], 'admin')
+        self.assertEqual([t['id'] for t in self.db.get_tasks_by_project('p1')], [self.task['id']])
+        self.assertEqual(self.db.get_project('p1')['title'], 'Project')
+
+        self.assertEqual([g['key'] for g in self.db.get_task_stats('2026-01-01', '2026-01-31')], ['admin'])
+        self.db.delete_task(self.task['id'])
+        reopened = SQLiteDatabase(db_path=self.db.db_path, data_dir=self.data_dir)
+        self.assertEqual(reopened.get_tasks_by_project('p1'), [])
+
+    def test_migration_leaves_legacy_json_store_untouched(self):
+        legacy_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, legacy_dir, ignore_errors=True)
+        legacy_file = os.path.join(legacy_dir, 'daily_logs.json')
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            json.dump([{'id': '1', 'username': 'admin', 'date': '2020-01-05', 'title': 'Old', 'project_id': None}], f)
+        with open(os.path.join(legacy_dir, 'daily_logs.wal'), 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'op': 'update', 'id': '1', 'updates': {'title': 'Renamed'}}) + '\n')
+
+        db = SQLiteDatabase(db_path=os.path.join(legacy_dir, 'blg.db'), data_dir=legacy_dir)
+        self.assertEqual([t['title'] for t in db.get_user_tasks('admin', '2020-01-05')], ['Renamed'])
+        self.assertEqual(db.get_user('admin')['role'], 'admin')
+        self.assertEqual(sorted(n for n in os.listdir(legacy_dir) if not n.startswith('blg.db')),
+                         ['daily_logs.json', 'daily_logs.wal'])
+
+    def test_add_task_never_overwrites_existing_id(self):
+        taken = dict(self.task, id='1768694400.0')
+        with self.db._transaction() as conn:
+            self.db._put_task(conn, taken)
+        with mock.patch('database._new_task', side_effect=lambda user, title, *a: dict(taken, title=title)):
+            added = self.db.add_task('admin', 'New', '2026-01-18')
+            created = self.db.apply_task_batch(new_tasks=[{'username': 'admin', 'title': 'Batch', 'date': '2026-01-18'}])
+        self.assertEqual((added['id'], created[0]['id']), ('1768694400.000001', '1768694400.000002'))
+        self.assertEqual(sorted(t['title'] for t in self.db.get_user_tasks('admin', '2026-01-18')),
+                         ['Batch', 'From JSON', 'From JSON', 'New'])
+
+    def test_same_api_as_json_backend(self):
+        t = self.db.add_task('operativa', 'New', '2026-01-19')
+        self.assertTrue(self.db.update_task_status(t['id'], True))
+        self.assertTrue(self.db.get_user_tasks('operativa', '2026-01-19')[0]['completed'])
+        self.assertEqual(len(self.db.get_all_tasks_by_date('2026-01-19')), 1)
+        self.assertFalse(self.db.update_task('missing', {'completed': True}))
+
+        created = self.db.apply_task_batch(
+            new_tasks=[{'username': 'admin', 'title': 'Batch', 'date': '2026-01-19', 'project_id': 'p1'}],
+            updates={t['id']: {'title': 'Renamed'}},
+            deletes=[self.task['id']])
+        self.assertEqual([x['id'] for x in self.db.get_tasks_by_project('p1')], [created[0]['id']])
+        self.assertEqual(self.db.get_user_tasks('operativa', '2026-01-19')[0]['title'], 'Renamed')
+
+        stats = self.db.get_task_stats('2026-01-18', '2026-01-19', 'project')
+        self.assertEqual([(g['key'], g['total'], g['completed']) for g in stats], [('', 1, 1), ('p1', 1, 0)])
+        self.assertEqual(stats[1]['days'], {'2026-01-19': [1, 0]})
+
+        self.assertTrue(self.db.update_user_settings('admin', {'quick_access': ['vw_stock']}))
+        self.assertEqual(self.db.get_user('admin')['quick_access'], ['vw_stock'])
+        self.assertFalse(self.db.add_user('admin', {}))
+
+        self.db.save_project({'id': 'p2', 'title': 'Second'})
+        self.db.save_project({'id': 'p1', 'title': 'Renamed'})
+        self.assertEqual([p['title'] for p in self.db.get_projects()], ['Renamed', 'Second'])
+        self.assertTrue(self.db.archive_project('p2'))
+        self.assertTrue(self.db.get_project('p2')['archived'])
+        self.assertTrue(self.db.delete_project('p2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
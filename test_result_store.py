@@ -0,0 +1,39 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from result_store import ResultStore
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.store = ResultStore(store_dir=self.store_dir, ttl=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def test_same_content_is_stored_once(self):
+        a = self.store.put(io.BytesIO(b'workbook'))
+        b = self.store.put(io.BytesIO(b'workbook'))
+        self.assertEqual(a, b)
+        self.assertEqual(os.listdir(self.store_dir), [a])
+        with open(self.store.path(a), 'rb') as f:
+            self.assertEqual(f.read(), b'workbook')
+        self.assertEqual(self.store.download_url(a, '20260118 - SHIP - PL.xlsx'),
+                         f'/api/results/{a}?name=20260118+-+SHIP+-+PL.xlsx')
+        self.assertIsNone(self.store.path('../users.json'))
+
+    def test_expired_results_are_evicted(self):
+        digest = self.store.put(io.BytesIO(b'old'))
+        old = time.time() - 120
+        os.utime(self.store.path(digest), (old, old))
+        self.store.evict(force=True)
+        self.assertFalse(self.store.exists(digest))
+
+
+if __name__ == '__main__':
+    unittest.main()
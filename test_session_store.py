@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask, session
+
+from session_store import ServerSideSessionInterface, SQLiteSessionStore
+
+
+class TestServerSideSessions(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.store = SQLiteSessionStore(os.path.join(self.data_dir, 'sessions.db'))
+        app = Flask(__name__)
+        app.session_interface = ServerSideSessionInterface(self.store)
+
+        @app.route('/login/<name>')
+        def login(name):
+            session.regenerate()
+            session['username'] = name
+            return 'ok'
+
+        @app.route('/whoami')
+        def whoami():
+            return session.get('username', '')
+
+        @app.route('/logout')
+        def logout():
+            session.clear()
+            return 'ok'
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def test_cookie_holds_only_an_opaque_id(self):
+        self.assertEqual(self.client.get('/whoami').text, '')
+        self.assertIsNone(self.client.get_cookie('session'))
+
+        self.client.get('/login/admin')
+        sid = self.client.get_cookie('session').value
+        self.assertNotIn('admin', sid)
+        self.assertEqual(self.store.get(sid)[0], {'username': 'admin'})
+        self.assertEqual(self.client.get('/whoami').text, 'admin')
+
+        # Logging in again rotates the id and drops the old one
+        self.client.get('/login/operativa')
+        self.assertNotEqual(self.client.get_cookie('session').value, sid)
+        self.assertEqual(self.store.get(sid), (None, None))
+
+        self.client.get('/logout')
+        self.assertIsNone(self.client.get_cookie('session'))
+        self.assertEqual(self.client.get('/whoami').text, '')
+
+    def test_expired_sessions_are_ignored_and_purged(self):
+        self.store.set('old', {'username': 'admin'}, 1)
+        self.client.set_cookie('session', 'old')
+        self.assertEqual(self.client.get('/whoami').text, '')
+        self.store.purge_expired(force=True)
+        self.assertIsNone(self.store._conn().execute("SELECT 1 FROM sessions WHERE id = 'old'").fetchone())
+
+
+if __name__ == '__main__':
+    unittest.main()
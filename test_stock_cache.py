@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from stock_cache import StockCache
+from vw_t2l_utils import VWAttListaHelper
+
+STOCK_CSV = b"CHASSIS;DESTINATION;INVOICE;DESCRIPTION;WEIGHT;HS-CODE\nWVW001;EGYAG;INV1;GOLF;1300;8703.23\nWVW002;LIMA;INV2;POLO;1100,5;8703.22\n"
+
+
+class TestStockCache(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.cache = StockCache(store_dir=self.store_dir, ttl=60)
+        self.helper = VWAttListaHelper()
+        self.loads = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def load(self, csv_file_obj):
+        self.loads += 1
+        return self.helper.load_stock(csv_file_obj)
+
+    def test_stock_is_parsed_once(self):
+        stock_id = self.cache.put(STOCK_CSV, self.load)
+        self.assertEqual(self.cache.put(STOCK_CSV, self.load), stock_id)
+        self.assertEqual(self.loads, 1)
+
+        # Another worker (empty memory) reads the stored table
+        other = StockCache(store_dir=self.store_dir, ttl=60)
+        data = self.helper.process_stock(other.get(stock_id), ['WVW002'], [], 'SWB')
+        self.assertEqual(data['df']['WEIGHT'].tolist(), [1100])
+        self.assertEqual(data['df']['DESTINATION'].tolist(), ['LIMASSOL'])
+
+    def test_unknown_or_evicted_stock(self):
+        self.assertIsNone(self.cache.get('0' * 64))
+        self.assertIsNone(self.cache.get('../users'))
+        stock_id = self.cache.put(STOCK_CSV, self.load)
+        for name in os.listdir(self.store_dir):
+            os.utime(os.path.join(self.store_dir, name), (0, 0))
+        self.cache.evict(force=True)
+        self.assertIsNone(self.cache.get(stock_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import io
+import unittest
+import zipfile
+
+import openpyxl
+
+from t2l_batch import generate_t2l_batch
+from vw_t2l_utils import VWAttListaHelper
+
+STOCK_CSV = (b"CHASSIS;DESTINATION;INVOICE;DESCRIPTION;WEIGHT;HS-CODE\n"
+             b"WVW001;EGYAG;INV1;GOLF;1300;8703.23\n"
+             b"WVW002;LIMA;INV2;POLO;1100;8703.22\n"
+             b"WVW003;PIRE;INV3;TIGUAN;1600;8703.23\n")
+
+
+class TestT2LBatch(unittest.TestCase):
+    def test_one_workbook_per_swb(self):
+        stock = VWAttListaHelper().load_stock(io.BytesIO(STOCK_CSV))
+        entries = [
+            {'swb': '003', 'chassis': 'WVW001\nWVW003', 'diz': 'D1'},
+            {'swb': '004', 'chassis': ['WVW002'], 'diz': []},
+            {'swb': '004', 'chassis': ['WVW001']},
+        ]
+        for workers in (1, 2):
+            with zipfile.ZipFile(generate_t2l_batch('vw', stock, entries, workers=workers)) as zf:
+                self.assertEqual(zf.namelist(), ['003 - ATT.LISTA 2X .xlsx', '004 - ATT.LISTA 1X .xlsx',
+                                                 '004 - ATT.LISTA 1X (2).xlsx'])
+                wb = openpyxl.load_workbook(io.BytesIO(zf.read('003 - ATT.LISTA 2X .xlsx')))
+                ws = wb['ALL VW']
+                self.assertEqual([ws.cell(r, 2).value for r in (4, 5)], ['WVW001', 'WVW003'])
+                self.assertEqual(ws.cell(6, 5).value, 2900)
+
+    def test_unknown_swb_vehicles(self):
+        stock = VWAttListaHelper().load_stock(io.BytesIO(STOCK_CSV))
+        with self.assertRaisesRegex(ValueError, 'SWB 005'):
+            generate_t2l_batch('vw', stock, [{'swb': '005', 'chassis': 'NOPE'}], workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import openpyxl
+import xlsxwriter
+
+from toyota_damage_utils import ToyotaDamageProcessor, LINE_GARBAGE, LINE_TABLE_ROW, LINE_VIN_HEADER, LINE_TEXT
+from toyota_damage_utils import PdfReader, extract_pdf_text
+import pool_utils
+from jobs import JobError, damage_report_job
+
+# Golden corpus: expected outputs were captured from the per-line implementation
+# before the classifier was precompiled, so any drift in parsing shows up here.
+NORMAL_REPORT = """Luka Koper d.d.   Stran: 1
+Skladišče: TERMINAL AVTOMOBILOV
+Ladja: MORNING CAPE   Datum: 12.01.2026
+NO. VIN VESSEL DESTINATION VCP MODEL WEIGHT MOT LF DATE MRN DIZ DAMAGE
+1 JTDKB20U803456789 MORNING CAPE EGYAG 123 YARIS 1100
+2. SB1KV58E50F012345 MORNING CAPE LIMA 124 COROLLA 1300
+JTDKB20U803456789 03 - 12 - 01 SCRATCH
+03 - UP TO 2 CM
+O: 12:45
+SB1KV58E50F012345: 10 - 20 - 02 DENT
+over 30 cm
+05 - 31 - 03 PAINT CHIP -
+missing part
+90 - FRAME 10 - STAINED OR SOILED 05 - OVER 30 CM IN LENGTH/DIAMETER
+PAGE 2
+1.234,56
+BI
+x
+VIN: NMTKZ3BE10R123456
+NMTKZ3BE10R123456 PT 04 - 33 - 01 BUMPER 02 - cm
+02 - antenna broken
+ZA SKRITE NAPAKE LUKA NE ODGOVARJA.
+nad 10 cm
+12345678901234567 all digits line
+YARIS   07 - 40 - 02 DOOR DENT   14:
+Št. VIN JTDKB20U803456789
+Podpisali: operater
+continuation after reset
+JTDKB20U803456789 22 - 11 - 05 glass crack  12:3
+90 - FRAME 30 - FLUID SPILLAGE, EXTERIOR (OIL SPILLAGE, BIRD DROP, OTH.) 05 - OVER 30 CM IN LENGTH/DIAMETER
+vrata 05 - dent
+  3   WVWZZZ1JZXW000001 extra
+WVWZZZ1JZXW000001 06 - 41 - 01 ROOF
+06 - vrata
+do 5 cm
+Zaključeno
+"""
+
+ZP_REPORT = """ZAPISNIK O SKRITIH NAPAKAH
+Naročnik: TOYOTA
+ZP: JTDKB20U803456789 03 - 12 - 01 SCRATCH
+over 10 cm
+JTDKB20U803456789 should be ignored table line
+ZP JTDKB20U803456790: 10 - 20 - 02 DENT
+05 - 31 - 03 PAINT CHIP
+zp:SB1KV58E50F012345 FRAME 30 - FLUID SPILLAGE, EXTERIOR 02 - 
+cm
+PAGE 3
+plain text without vin
+ZP : NMTKZ3BE10R123456
+22 - 11 - 05 glass
+B/L 12345
+more text after garbage
+"""
+
+EXPECTED_NORMAL = {'JTDKB20U803456789': ['03 - 12 - 01 SCRATCH 03 - UP TO 2 CM 12:45 Št. VIN',
+                       '22 - 11 - 05 glass crack 12:3',
+                       'vrata 05 - dent'],
+ 'SB1KV58E50F012345': ['10 - 20 - 02 DENT over 30 cm', '05 - 31 - 03 PAINT CHIP - missing part'],
+ 'NMTKZ3BE10R123456': ['VIN:', '04 - 33 - 01 BUMPER 02 - cm', '02 - antenna broken'],
+ 'WVWZZZ1JZXW000001': ['06 - 41 - 01 ROOF', '06 - vrata do 5 cm']}
+
+EXPECTED_ZP = {'JTDKB20U803456789': ['03 - 12 - 01 SCRATCH over 10 cm'],
+ 'JTDKB20U803456790': ['10 - 20 - 02 DENT', '05 - 31 - 03 PAINT CHIP'],
+ 'SB1KV58E50F012345': ['FRAME 30 - FLUID SPILLAGE, EXTERIOR 02 - cm'],
+ 'NMTKZ3BE10R123456': ['22 - 11 - 05 glass']}
+
+
+def make_pdf(pages):
+    """Minimal PDF with one Helvetica text line per entry of each page's line list."""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_ids = []
+    for lines in pages:
+        ops = ['BT /F1 10 Tf 12 TL 40 800 Td']
+        for line in lines:
+            ops.append('(%s) Tj T*' % line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)'))
+        ops.append('ET')
+        stream = '\n'.join(ops).encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (len(objects)))
+        page_ids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % i for i in page_ids), len(page_ids))
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % i + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for off in offsets:
+        out.write(b'%010d 00000 n \n' % off)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+class TestToyotaDamage(unittest.TestCase):
+    def setUp(self):
+        self.processor = ToyotaDamageProcessor()
+
+    def test_golden_corpus(self):
+        self.assertEqual(self.processor.process_raw_text(NORMAL_REPORT), EXPECTED_NORMAL)
+        self.assertEqual(self.processor.process_raw_text(ZP_REPORT), EXPECTED_ZP)
+
+    @unittest.skipIf(PdfReader is None, 'pypdf not installed')
+    def test_pdf_pages_extracted_in_order(self):
+        # Ascii-only corpus lines (the minimal PDF font has no encoding for č/š)
+        lines = [l for l in NORMAL_REPORT.split('\n') if l.isascii()]
+        pages = [lines[i:i + 3] for i in range(0, len(lines), 3)]
+        pdf = make_pdf(pages)
+        parallel = extract_pdf_text(pdf, workers=2)
+        self.assertEqual(parallel, extract_pdf_text(pdf, workers=1))
+        self.assertEqual([l.strip() for l in parallel.split('\n')], [l.strip() for l in lines])
+        self.assertEqual(self.processor.process_raw_text(parallel),
+                         self.processor.process_raw_text('\n'.join(lines)))
+
+        # Inside a pooled job the pages are read in the job's own process
+        with mock.patch.object(pool_utils, 'job_worker', True), \
+             mock.patch('toyota_damage_utils.ProcessPoolExecutor', side_effect=AssertionError):
+            self.assertEqual(extract_pdf_text(pdf, workers=2), parallel)
+
+    @unittest.skipIf(PdfReader is None, 'pypdf not installed')
+    def test_unreadable_pdf(self):
+        with self.assertRaises(ValueError):
+            extract_pdf_text(b'not a pdf')
+        with self.assertRaises(JobError):
+            damage_report_job(b'VIN\n', '', pdf_bytes=b'not a pdf')
+
+    def test_xlsx_and_csv_manifests_give_same_rows(self):
+        header = ['NO.', 'VIN', 'MODEL', 'WEIGHT', 'DAMAGE']
+        data = [[1, 'JTDKB20U803456789', 'YARIS', 1100.0, None],
+                [2, 'SB1KV58E50F012345', 'COROLLA', 1300, None]]
+        wb = openpyxl.Workbook()
+        wb.active.append(header)
+        wb.active.append([])
+        for row in data:
+            wb.active.append(row)
+        xlsx = io.BytesIO()
+        wb.save(xlsx)
+        csv = '\n'.join(';'.join('' if v is None else str(v).replace('.0', '') for v in r)
+                        for r in [header] + data).encode('utf-8')
+
+        xlsx_rows = list(self.processor.read_manifest_rows(xlsx.getvalue(), 'manifest.xlsx'))
+        self.assertEqual(xlsx_rows, [header, ['1', 'JTDKB20U803456789', 'YARIS', '1100'],
+                                     ['2', 'SB1KV58E50F012345', 'COROLLA', '1300']])
+        self.assertEqual(xlsx_rows, [r[:4] if i else r for i, r in enumerate(self.processor.read_manifest_rows(csv))])
+
+        rows, damage_idx = self.processor.process_manifest_reorder(
+            iter(xlsx_rows), EXPECTED_NORMAL, vin_order_list=['SB1KV58E50F012345'])
+        self.assertEqual(damage_idx, 4)
+        self.assertEqual([r['cells'][1] for r in rows], ['VIN', 'SB1KV58E50F012345', 'JTDKB20U803456789'])
+        self.assertEqual(rows[1]['damages'], EXPECTED_NORMAL['SB1KV58E50F012345'])
+
+    def test_manual_damages_use_row_vin_index(self):
+        manifest = 'NO;CHASSIS;NOTE\n1;JTDKB20U803456789;ABCDEFGHJK1234567\n2;JTDKB20U803456789;\n3;x;SB1KV58E50F012345'
+        parsed = {'JTDKB20U803456789': ['03 - SCRATCH']}
+        rows, _ = self.processor.process_manifest_reorder(manifest, parsed)
+        self.assertEqual([r['vin'] for r in rows], [None, 'JTDKB20U803456789', 'JTDKB20U803456789', 'SB1KV58E50F012345'])
+
+        self.processor.inject_manual_damages(rows, 'jtdkb20u803456789: dent\nSB1KV58E50F012345: glass')
+        self.assertEqual([r['damages'] for r in rows[1:]],
+                         [['03 - SCRATCH', 'dent'], ['03 - SCRATCH', 'dent'], ['glass']])
+        self.assertEqual(parsed, {'JTDKB20U803456789': ['03 - SCRATCH']})
+
+    def test_remark_with_other_vin_does_not_pick_vin_column(self):
+        manifest = ('NO;CHASSIS NO;REMARK\n1;;see JTDKB20U203123452\n2;JTDKB20U203123456;ok\n'
+                    '3;JTDKB20U203123451;repl. JTDKB20U203123456')
+        parsed = {'JTDKB20U203123456': ['456'], 'JTDKB20U203123451': ['451'], 'JTDKB20U203123452': ['452']}
+        for header in ('CHASSIS NO', 'X'): # by header name, or by vote when the header is unknown
+            rows, _ = self.processor.process_manifest_reorder(manifest.replace('CHASSIS NO', header), parsed)
+            self.assertEqual([(r['vin'], r['damages']) for r in rows[1:]],
+                             [(None, []), ('JTDKB20U203123456', ['456']), ('JTDKB20U203123451', ['451'])])
+
+        rows, _ = self.processor.process_manifest_reorder(manifest, parsed, vin_order_list=['JTDKB20U203123451'])
+        self.assertEqual([r['cells'][0] for r in rows], ['NO', '3', '2'])
+
+        for name in ('VIN', 'Vin No.', 'CHASSIS NUMBER', 'Chassis-Nr', 'ŠASIJA'):
+            self.assertEqual(self.processor.find_vin_header(['NO', name]), 1, name)
+        self.assertIsNone(self.processor.find_vin_header(['NO', 'REMARK', 'CHASSIS TYPE']))
+
+    def test_classify_line(self):
+        self.assertEqual(self.processor.classify_line('Ladja: MORNING CAPE'), LINE_GARBAGE)
+        self.assertEqual(self.processor.classify_line('1.234,56'), LINE_GARBAGE)
+        self.assertEqual(self.processor.classify_line('2. SB1KV58E50F012345 MORNING'), LINE_TABLE_ROW)
+        self.assertEqual(self.processor.classify_line('VIN: NMTKZ3BE10R123456'), LINE_VIN_HEADER)
+        self.assertEqual(self.processor.classify_line('03 - UP TO 2 CM'), LINE_TEXT)
+
+
+class TestDamageExport(unittest.TestCase):
+    def setUp(self):
+        self.processor = ToyotaDamageProcessor()
+
+    def test_export_marks_damages_red(self):
+        rows = [{'cells': ['VIN1', 'X'], 'damages': ['D1', 'D2']},
+                {'cells': ['VIN2', 'Y', 'Z', 'W'], 'damages': ['D3']}]
+        wb = openpyxl.load_workbook(self.processor.export_excel(rows, 2))
+        self.assertEqual(wb.sheetnames, ['Final'])
+        ws = wb['Final']
+        self.assertEqual([list(r) for r in ws.iter_rows(values_only=True)],
+                         [['VIN1', 'X', 'D1', 'D2'], ['VIN2', 'Y', 'D3', 'W']])
+        self.assertTrue(ws['C2'].font.bold)
+        self.assertFalse(ws['D2'].font.bold)
+        with_copy = self.processor.export_excel(rows, 2, formatted_copy=True)
+        self.assertEqual(openpyxl.load_workbook(with_copy).sheetnames, ['Final', 'Formatted'])
+
+    def test_single_constant_memory_pass(self):
+        # Red by damage column range: a cell elsewhere with the same text as a damage stays plain
+        rows = [{'cells': ['D1', 'X'], 'damages': ['D1']}] * 3
+        with mock.patch('toyota_damage_utils.xlsxwriter.Workbook', wraps=xlsxwriter.Workbook) as workbook:
+            buf = self.processor.export_excel(rows, 2)
+        self.assertEqual(workbook.call_args.args[1], {'constant_memory': True})
+        ws = openpyxl.load_workbook(buf)['Final']
+        self.assertEqual([list(r) for r in ws.iter_rows(values_only=True)], [['D1', 'X', 'D1']] * 3)
+        self.assertEqual([(c.value, bool(c.font.bold)) for c in ws[3]], [('D1', False), ('X', False), ('D1', True)])
+
+    def test_damage_report_built_in_memory(self):
+        manifest = b'NO;VIN;MODEL;DAMAGE\n1;SB1KV58E50F012345;COROLLA;\n2;WVWZZZ1JZXW000001;GOLF;'
+        cwd = os.getcwd()
+        tmp = tempfile.mkdtemp()
+        try:
+            os.chdir(tmp)
+            result = damage_report_job(manifest, NORMAL_REPORT, manifest_filename='manifest.csv')
+            self.assertEqual(os.listdir(tmp), []) # no temp_damage_*.xlsx left behind
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        wb = openpyxl.load_workbook(io.BytesIO(result['file']))
+        self.assertEqual(wb.sheetnames, ['Final'])
+        rows = [list(r) for r in wb['Final'].iter_rows(values_only=True)]
+        self.assertEqual(rows[0][:4], ['NO', 'VIN', 'MODEL', 'DAMAGE'])
+        self.assertEqual(rows[1], ['1', 'SB1KV58E50F012345', 'COROLLA'] + EXPECTED_NORMAL['SB1KV58E50F012345'])
+        self.assertEqual(rows[2], ['2', 'WVWZZZ1JZXW000001', 'GOLF'] + EXPECTED_NORMAL['WVWZZZ1JZXW000001'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import io
+import unittest
+
+import openpyxl
+import pandas as pd
+
+import toyota_utils
+from toyota_utils import ToyotaTrainProcessor
+
+
+def to_xlsx(df):
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+class TestToyotaTrain(unittest.TestCase):
+    def test_phase_1_merge(self):
+        odstrel = pd.DataFrame({
+            'SASIJA': [' JTDKB20U803456789', 'SB1KV58E50F012345', 'x'],
+            'VAGON': ['31 80 4291 001', '4371 002', ''],
+            'WEIGHT': [1100, 1200, 0],
+        })
+        plan = pd.DataFrame({
+            'VIN': ['JTDKB20U803456789'],
+            'CILJ': ['EGYAG'],
+            'WEIGHT': [1150],
+            'VALUE': ['12,5'],
+        })
+        df = ToyotaTrainProcessor().process_phase_1(to_xlsx(odstrel), to_xlsx(plan), is_t1=True)
+
+        self.assertEqual(df['NO.'].tolist(), [1, 2])
+        self.assertEqual(df['VIN'].tolist(), ['JTDKB20U803456789', 'SB1KV58E50F012345'])
+        self.assertEqual(df['LF'].tolist(), ['10', '13'])
+        self.assertEqual(df['DESTINATION'].tolist(), ['EGYAG', ''])
+        # Plan wins over odstrel, also when both files use the same column name
+        self.assertEqual(df['WEIGHT'].tolist(), [1150, 1200])
+        self.assertEqual(df['VALUE'].tolist(), [12.5, 0])
+
+        stats = ToyotaTrainProcessor().process_phase_2(df)
+        self.assertEqual(stats['stats']['total_cars'], 2)
+        self.assertEqual(stats['stats']['total_weight'], 2350)
+
+        wb = openpyxl.load_workbook(ToyotaTrainProcessor().export_excel(df, stats))
+        self.assertEqual(wb.sheetnames, ['WAG', 'eTL'])
+        wag = list(wb['WAG'].iter_rows(values_only=True))
+        self.assertEqual(wag[0], tuple(df.columns))
+        self.assertEqual(wag[1][1:3], ('JTDKB20U803456789', None))
+        self.assertEqual(len(wag), 3)
+        etl = list(wb['eTL'].iter_rows(values_only=True))
+        self.assertEqual(etl[1], ('31 80 4291 001', '10', 1, 1150))
+        self.assertIn(('Skupaj', 2, 2, 2350), etl)
+        self.assertIn(('Vrednost', None, None, 12.5), etl)
+
+    def test_batch_reads_plan_once(self):
+        plan = to_xlsx(pd.DataFrame({'VIN': ['JTDKB20U803456789', 'SB1KV58E50F012345'], 'TEZA': [1000, 2000]}))
+        trains = [('train1.xlsx', to_xlsx(pd.DataFrame({'VIN': ['JTDKB20U803456789'], 'VAGON': ['4291']}))),
+                  ('train2.xlsx', to_xlsx(pd.DataFrame({'VIN': ['SB1KV58E50F012345'], 'VAGON': ['4371']})))]
+        processor = ToyotaTrainProcessor()
+        result = processor.process_trains(trains, plan, workers=2)
+
+        self.assertEqual({name: t['stats']['total_weight'] for name, t in result['trains'].items()},
+                         {'train1.xlsx': 1000, 'train2.xlsx': 2000})
+        self.assertEqual(result['summary']['stats']['total_weight'], 3000)
+        self.assertEqual(result['summary']['stats']['wagons_count'], 2)
+        self.assertEqual(processor.process_trains(trains, plan, workers=1), result)
+        same_name = processor.process_trains([trains[0], trains[0]], plan, workers=1)['trains']
+        self.assertEqual(list(same_name), ['train1.xlsx', 'train1.xlsx (2)'])
+
+    def test_plan_cache_skips_excel_parsing(self):
+        plan = to_xlsx(pd.DataFrame({'VIN': ['JTDKB20U803456789'], 'TEZA': [1000], 'NOTE': ['cache test']}))
+        calls = []
+        original = pd.read_excel
+        toyota_utils.pd.read_excel = lambda *a, **kw: calls.append(1) or original(*a, **kw)
+        try:
+            first = ToyotaTrainProcessor().load_plan(plan)
+            second = ToyotaTrainProcessor().load_plan(bytes(plan))
+        finally:
+            toyota_utils.pd.read_excel = original
+        self.assertIs(first, second)
+        self.assertEqual(calls, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
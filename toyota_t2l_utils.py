@@ -3,7 +3,12 @@ import re
 import io
 import xlsxwriter
 
+from csv_ingest import parse_weights, read_csv_columns
+
 class ToyotaAttListaHelper:
+    # Stolpci iz load_and_process v vrstnem redu izvoza
+    EXPORT_COLUMNS = ['VIN', 'INVOICE', 'DESCRIPTION', 'WEIGHT', 'DESTINATION', 'HS_CODE']
+
     def __init__(self):
         # Destinacije (enako kot pri VW)
         self.destinations_map = {
@@ -28,6 +33,24 @@ class ToyotaAttListaHelper:
             return clean[:6]
         return clean
 
+    def column_map(self, columns):
+        """Ključ -> ime stolpca (imena že v velikih črkah, kot jih vrne load_stock)."""
+        col_map = {}
+        for c in columns:
+            if "VIN" in c: col_map['CHASSIS'] = c
+            elif "DESTINATION" in c: col_map['DESTINATION'] = c
+            elif "DVH" in c: col_map['INVOICE'] = c      # Toyota uporablja DVH za Invoice
+            elif "MODEL" in c: col_map['DESCRIPTION'] = c # Toyota uporablja MODEL za Description
+            elif "WEIGHT" in c: col_map['WEIGHT'] = c
+        return col_map
+
+    def load_stock(self, csv_file_obj):
+        """
+        Prebere TOYOTA Stock CSV (ločilo in kodiranje se prepoznata) z normaliziranimi imeni stolpcev.
+        Prebrani so samo stolpci iz column_map.
+        """
+        return read_csv_columns(csv_file_obj, select=lambda names: self.column_map(names).values())
+
     def load_and_process(self, csv_file_obj, chassis_list, diz_list, swb_no, manual_hs_codes=None):
         """
         Inputs:
@@ -37,28 +60,17 @@ class ToyotaAttListaHelper:
             swb_no: SWB številka
             manual_hs_codes: Slovar {VIN: HS_CODE}, ki ga uporabnik vnese ročno
         """
+        return self.process_stock(self.load_stock(csv_file_obj), chassis_list, diz_list, swb_no,
+                                  manual_hs_codes=manual_hs_codes)
+
+    def process_stock(self, df, chassis_list, diz_list, swb_no, manual_hs_codes=None):
+        """Obdelava že prebranega Stock CSV (load_stock); df se ne spreminja."""
         if manual_hs_codes is None:
             manual_hs_codes = {}
 
-        # 1. Branje CSV
-        try:
-            df = pd.read_csv(csv_file_obj, sep=';', on_bad_lines='skip', dtype=str)
-        except:
-            if hasattr(csv_file_obj, 'seek'):
-                csv_file_obj.seek(0)
-            df = pd.read_csv(csv_file_obj, sep=',', on_bad_lines='skip', dtype=str)
-
-        df.columns = [c.strip().upper() for c in df.columns]
-
         # 2. Mapiranje stolpcev (Specifično za TOYOTA)
-        col_map = {}
-        for c in df.columns:
-            if "VIN" in c: col_map['CHASSIS'] = c
-            elif "DESTINATION" in c: col_map['DESTINATION'] = c
-            elif "DVH" in c: col_map['INVOICE'] = c      # Toyota uporablja DVH za Invoice
-            elif "MODEL" in c: col_map['DESCRIPTION'] = c # Toyota uporablja MODEL za Description
-            elif "WEIGHT" in c: col_map['WEIGHT'] = c
-        
+        col_map = self.column_map(df.columns)
+
         if 'CHASSIS' not in col_map:
             raise ValueError("CSV datoteka nima stolpca VIN/CHASSIS.")
 
@@ -66,48 +78,41 @@ class ToyotaAttListaHelper:
         clean_chassis_input = [c.strip() for c in chassis_list if c.strip()]
         
         # Filtriranje DataFrame-a
-        matched_df = df[df[col_map['CHASSIS']].isin(clean_chassis_input)].copy()
+        matched_df = df[df[col_map['CHASSIS']].isin(clean_chassis_input)].reset_index(drop=True)
+        vins = matched_df[col_map['CHASSIS']]
         
         # Opozorilo za manjkajoče
-        found_vins = set(matched_df[col_map['CHASSIS']])
-        missing_vins = set(clean_chassis_input) - found_vins
+        missing_vins = set(clean_chassis_input) - set(vins)
         if missing_vins:
             print(f"OPOZORILO: Naslednje šasije niso bile najdene: {missing_vins}")
 
-        processed_data = []
-
-        for _, row in matched_df.iterrows():
-            vin = row[col_map['CHASSIS']]
-            
-            # Destinacija
-            raw_dest = row.get(col_map.get('DESTINATION'), "")
-            mapped_dest = self.destinations_map.get(raw_dest, raw_dest)
-            final_dest = self.clean_destination(mapped_dest)
-            
-            # Teža
-            weight_str = str(row.get(col_map.get('WEIGHT'), "0")).replace(',', '.')
-            try: weight = int(float(weight_str))
-            except: weight = 0
-
-            # HS Koda (Logika: Ročni vnos > Default "TOYOTA")
-            hs_code = "TOYOTA"
-            if vin in manual_hs_codes:
-                hs_code = self.clean_hs_code(manual_hs_codes[vin])
-            
-            processed_data.append({
-                'VIN': vin,
-                'INVOICE': row.get(col_map.get('INVOICE'), ""),
-                'DESCRIPTION': row.get(col_map.get('DESCRIPTION'), ""),
-                'WEIGHT': weight,
-                'DESTINATION': final_dest,
-                'HS_CODE': hs_code
-            })
-
-        final_df = pd.DataFrame(processed_data)
-
-        if final_df.empty:
+        if matched_df.empty:
             raise ValueError("Nobenega vozila ni bilo mogoče najti.")
 
+        def column(key, default):
+            col = col_map.get(key)
+            if col is None:
+                return pd.Series(default, index=matched_df.index, dtype=object)
+            return matched_df[col]
+
+        # Destinacija (NaN kot niz 'nan', enako kot str(NaN) v prejšnji obdelavi po vrsticah)
+        raw_dest = column('DESTINATION', "").fillna('nan')
+        final_dest = (raw_dest.map(self.destinations_map).fillna(raw_dest)
+                      .str.replace(r'\s*\(.*?\)\s*', '', regex=True).str.strip())
+
+        # HS Koda (Logika: Ročni vnos > Default "TOYOTA")
+        manual = {vin: self.clean_hs_code(code) for vin, code in manual_hs_codes.items()}
+        hs_codes = vins.map(manual).fillna("TOYOTA")
+
+        final_df = pd.DataFrame({
+            'VIN': vins,
+            'INVOICE': column('INVOICE', ""),
+            'DESCRIPTION': column('DESCRIPTION', ""),
+            'WEIGHT': parse_weights(column('WEIGHT', "0")),
+            'DESTINATION': final_dest,
+            'HS_CODE': hs_codes
+        })
+
         # 4. Priprava za Excel (Good Items / Packaging / Docs)
         
         # Good Items
@@ -147,55 +152,42 @@ class ToyotaAttListaHelper:
     def export_to_excel_buffer(self, data_pack):
         """Adapted for Flask: returns io.BytesIO"""
         output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        workbook = writer.book
-        
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+
         # Stili
         bold_fmt = workbook.add_format({'bold': True})
         header_fmt = workbook.add_format({
             'bold': True, 'bg_color': '#CCFFCC', 'border': 1, 'align': 'center'
         })
-        
+
+        # Vrstice se pišejo sproti (constant_memory), NaN kot prazna celica
+        df = data_pack['df']
+        rows = df[self.EXPORT_COLUMNS].astype(object)
+        rows = rows.where(df[self.EXPORT_COLUMNS].notna(), None)
+
         # --- 1. Sheet: ALL TOYOTA ---
         ws_all = workbook.add_worksheet("ALL TOYOTA")
-        df = data_pack['df']
-        
-        # Header
         ws_all.write(1, 1, f"ATTACHED LIST SWB NO.: {data_pack['swb_no']}", bold_fmt)
         ws_all.write(1, 2, "T2L", header_fmt)
-        
-        headers = ["", "VINS:", "Invoices nos.:", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"]
-        for c, h in enumerate(headers):
-            ws_all.write(2, c, h, bold_fmt)
-            
-        total_weight = 0
-        for i, row in df.iterrows():
-            r = i + 3
-            total_weight += row['WEIGHT']
-            ws_all.write(r, 0, i + 1)
-            ws_all.write(r, 1, row['VIN'])
-            ws_all.write(r, 2, row['INVOICE'])
-            ws_all.write(r, 3, row['DESCRIPTION'])
-            ws_all.write(r, 4, row['WEIGHT'])
-            ws_all.write(r, 5, row['DESTINATION'])
-            ws_all.write(r, 6, row['HS_CODE'])
-            
-        ws_all.write(len(df) + 3, 4, total_weight, bold_fmt)
+        ws_all.write_row(2, 0, ["", "VINS:", "Invoices nos.:", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"], bold_fmt)
+
+        for i, row in enumerate(rows.itertuples(index=False, name=None)):
+            ws_all.write_row(i + 3, 0, (i + 1,) + row)
+
+        ws_all.write(len(df) + 3, 4, df['WEIGHT'].sum(), bold_fmt)
         ws_all.set_column(1, 6, 20)
 
-        # --- 2. Sheets per HS Code (Chunks) ---
-        unique_hs = sorted(df['HS_CODE'].unique())
+        # --- 2. Sheets per HS Code (Chunks of 99) ---
+        # En groupby prehod; skupine so urejene po HS kodi
+        chunk_size = 99
         sheet_names_counter = {}
+        sub_headers = ["CHASSIS", "INVOICE", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"]
+
+        for hs, hs_rows in rows.groupby(df['HS_CODE'], sort=True):
+            hs_weights = df['WEIGHT'].loc[hs_rows.index]
+            for start in range(0, len(hs_rows), chunk_size):
+                chunk = hs_rows.iloc[start:start + chunk_size]
 
-        for hs in unique_hs:
-            hs_vehicles = df[df['HS_CODE'] == hs]
-            chunk_size = 99
-            num_chunks = (len(hs_vehicles) + chunk_size - 1) // chunk_size
-            
-            for i in range(num_chunks):
-                chunk = hs_vehicles.iloc[i*chunk_size : (i+1)*chunk_size]
-                chunk_weight = chunk['WEIGHT'].sum()
-                
                 base_name = f"{len(chunk)}x {hs}"
                 sheet_name = base_name
                 if sheet_name in sheet_names_counter:
@@ -203,26 +195,15 @@ class ToyotaAttListaHelper:
                     sheet_name = f"{base_name} ({sheet_names_counter[sheet_name]})"
                 else:
                     sheet_names_counter[sheet_name] = 1
-                
+
                 ws_hs = workbook.add_worksheet(sheet_name[:31])
-                
-                sub_headers = ["CHASSIS", "INVOICE", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"]
-                for c_idx, h_txt in enumerate(sub_headers):
-                    ws_hs.write(0, c_idx, h_txt, bold_fmt)
-                    
-                r_idx = 1
-                for _, row in chunk.iterrows():
-                    ws_hs.write(r_idx, 0, row['VIN'])
-                    ws_hs.write(r_idx, 1, row['INVOICE'])
-                    ws_hs.write(r_idx, 2, row['DESCRIPTION'])
-                    ws_hs.write(r_idx, 3, row['WEIGHT'])
-                    ws_hs.write(r_idx, 4, row['DESTINATION'])
-                    ws_hs.write(r_idx, 5, row['HS_CODE'])
-                    r_idx += 1
-                
-                ws_hs.write(r_idx, 3, chunk_weight, bold_fmt)
+                ws_hs.write_row(0, 0, sub_headers, bold_fmt)
+                for r_idx, row in enumerate(chunk.itertuples(index=False, name=None), start=1):
+                    ws_hs.write_row(r_idx, 0, row)
+
+                ws_hs.write(len(chunk) + 1, 3, hs_weights.iloc[start:start + chunk_size].sum(), bold_fmt)
                 ws_hs.set_column(0, 5, 20)
 
-        writer.close()
+        workbook.close()
         output.seek(0)
         return output
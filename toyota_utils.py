@@ -1,9 +1,32 @@
+import math
+import numpy as np
 import pandas as pd
+import xlsxwriter
 import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
 import re
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from pool_utils import pool_workers
+
+PLAN_CACHE_SIZE = int(os.environ.get('BLG_PLAN_CACHE_SIZE', 8))
+
+# LRU predpomnilnik prebranih Planov: sha256 vsebine -> tabela iz _key_frame
+_plan_cache = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+def _merge_train(odstrel_bytes, plan, is_t1):
+    """Pool worker za process_trains."""
+    return ToyotaTrainProcessor().merge_train(odstrel_bytes, plan, is_t1=is_t1)
 
 class ToyotaTrainProcessor:
+    # Ključi iz col_map, ki jih faza 1 prenese v WAG tabelo
+    PHASE_1_KEYS = ['vessel', 'dest', 'model', 'weight', 'mot', 'mrn', 'value']
+
     def __init__(self):
         # Slovar možnih imen stolpcev (kot v JS)
         self.col_map = {
@@ -46,85 +69,119 @@ class ToyotaTrainProcessor:
         """
         FAZA 1: Združi Odstrelek (Luka Koper) in Plan.
         """
-        # 1. Branje datotek
-        df_odstrel = pd.read_excel(io.BytesIO(odstrel_bytes))
-        df_plan = pd.read_excel(io.BytesIO(plan_bytes))
+        return self.merge_train(odstrel_bytes, self.load_plan(plan_bytes), is_t1=is_t1)
 
-        # 2. Normalizacija headerjev
-        df_odstrel = self.normalize_headers(df_odstrel)
-        df_plan = self.normalize_headers(df_plan)
-
-        # 3. Identifikacija ključnih stolpcev
-        vin_col_o = self.find_col(df_odstrel, 'vin')
-        vin_col_p = self.find_col(df_plan, 'vin')
-
-        if not vin_col_o or not vin_col_p:
+    def _key_frame(self, df):
+        """
+        Normalizira headerje in vrne tabelo samo z 'VIN' in stolpci iz col_map (en stolpec na ključ).
+        Stolpci se poiščejo enkrat na tabelo.
+        """
+        df = self.normalize_headers(df)
+        vin_col = self.find_col(df, 'vin')
+        if not vin_col:
             raise ValueError("Stolpec VIN ni najden v eni od datotek.")
 
-        # Priprava Plan slovarja za hitro iskanje (VIN -> Row Data)
         # Zaradi duplikatov odstranimo presledke
-        df_plan[vin_col_p] = df_plan[vin_col_p].astype(str).str.strip()
-        df_odstrel[vin_col_o] = df_odstrel[vin_col_o].astype(str).str.strip()
+        frame = pd.DataFrame({'VIN': df[vin_col].astype(str).str.strip()})
+        for key in self.PHASE_1_KEYS:
+            col = self.find_col(df, key)
+            frame[key] = df[col] if col is not None else None
+        return frame
+
+    def load_plan(self, plan_bytes):
+        """
+        Prebere Plan enkrat; rezultat se lahko uporabi za več vlakov (merge_train).
+        Isti Plan (enaka vsebina) se vzame iz LRU predpomnilnika brez ponovnega branja Excela.
+        Vrnjena tabela je deljena s predpomnilnikom, zato je ne spreminjaj.
+        """
+        key = hashlib.sha256(plan_bytes).hexdigest()
+        with _plan_cache_lock:
+            plan = _plan_cache.get(key)
+            if plan is not None:
+                _plan_cache.move_to_end(key)
+                return plan
+
+        plan = self._key_frame(pd.read_excel(io.BytesIO(plan_bytes)))
+        with _plan_cache_lock:
+            _plan_cache[key] = plan
+            _plan_cache.move_to_end(key)
+            while len(_plan_cache) > PLAN_CACHE_SIZE:
+                _plan_cache.popitem(last=False)
+        return plan
+
+    def merge_train(self, odstrel_bytes, plan, is_t1=False):
+        """Združi en Odstrelek z že prebranim Planom (load_plan) v WAG tabelo."""
+        left = self._key_frame(pd.read_excel(io.BytesIO(odstrel_bytes)))
 
         # Left Join (Odstrel je master)
-        merged = pd.merge(df_odstrel, df_plan, left_on=vin_col_o, right_on=vin_col_p, how='left', suffixes=('_O', '_P'))
+        merged = pd.merge(left, plan, on='VIN', how='left', suffixes=('_O', '_P'))
+        merged = merged[merged['VIN'].str.len() >= 5].reset_index(drop=True) # Skip prazne/smeti
+
+        def get_val(key):
+            # Vrednost iz Plana (P), če manjka, iz Odstrela (O)
+            return merged[f'{key}_P'].combine_first(merged[f'{key}_O']).fillna("")
 
         # 4. Konstrukcija končne tabele (WAG format)
-        final_data = []
-        
-        # Poišči stolpce v obeh tabelah (prioriteta PLAN, potem ODSTREL)
-        def get_val(row, key):
-            # Poskusi najti v Planu (P), če ne, v Odstrelu (O)
-            col_p = self.find_col(df_plan, key)
-            if col_p and pd.notna(row.get(col_p)): return row[col_p]
-            
-            col_o = self.find_col(df_odstrel, key)
-            if col_o and pd.notna(row.get(col_o)): return row[col_o]
-            return ""
-
-        seq = 1
-        for idx, row in merged.iterrows():
-            vin = row[vin_col_o]
-            if len(str(vin)) < 5: continue # Skip prazne/smeti
-
-            wagon = get_val(row, 'mot')
-            weight = get_val(row, 'weight')
-            
+        wagon = get_val('mot')
+        wagon_str = wagon.astype(str)
+
+        df_wag = pd.DataFrame({
+            'NO.': range(1, len(merged) + 1),
+            'VIN': merged['VIN'],
+            'VESSEL': get_val('vessel'),
+            'DESTINATION': get_val('dest'),
+            'MODEL': get_val('model'),
+            'WEIGHT': get_val('weight'),
+            'MOT': wagon,
             # LF Logika (kot v JS)
-            lf = ""
-            if "429" in str(wagon): lf = "10"
-            elif "437" in str(wagon): lf = "13"
-
-            entry = {
-                'NO.': seq,
-                'VIN': vin,
-                'VESSEL': get_val(row, 'vessel'),
-                'DESTINATION': get_val(row, 'dest'),
-                'MODEL': get_val(row, 'model'),
-                'WEIGHT': weight,
-                'MOT': wagon,
-                'LF': lf,
-                'MRN': get_val(row, 'mrn'),
-                # Datum logika
-                'DATE': datetime.now().strftime("%d.%m.%Y") # Poenostavljeno, v praksi parsaš stolpec DATE
-            }
-
-            # Dodajanje T1 vrednosti
-            if is_t1:
-                entry['VALUE'] = get_val(row, 'value')
-                # Pretvori v float za seštevanje
-                try: entry['VALUE'] = float(str(entry['VALUE']).replace(',', '.')) 
-                except: entry['VALUE'] = 0
-
-            # Dodajanje poškodb (iz Plana)
-            # Tu bi morali iterirati skozi vse stolpce 'DAMAGE' v planu
-            # Za demo poenostavljeno:
-            entry['DAMAGE'] = "" 
-            
-            final_data.append(entry)
-            seq += 1
-
-        return pd.DataFrame(final_data)
+            'LF': np.select([wagon_str.str.contains('429', regex=False),
+                             wagon_str.str.contains('437', regex=False)], ['10', '13'], ''),
+            'MRN': get_val('mrn'),
+            # Datum logika
+            'DATE': datetime.now().strftime("%d.%m.%Y") # Poenostavljeno, v praksi parsaš stolpec DATE
+        })
+
+        # Dodajanje T1 vrednosti (float za seštevanje, neveljavne = 0)
+        if is_t1:
+            values = get_val('value').astype(str).str.strip().str.replace(',', '.', regex=False)
+            df_wag['VALUE'] = pd.to_numeric(values, errors='coerce').fillna(0)
+
+        # Dodajanje poškodb (iz Plana)
+        # Tu bi morali iterirati skozi vse stolpce 'DAMAGE' v planu
+        # Za demo poenostavljeno:
+        df_wag['DAMAGE'] = ""
+
+        return df_wag
+
+    def process_trains(self, odstrel_files, plan_bytes, is_t1=False, workers=None):
+        """
+        Več vlakov na isti Plan: Plan se prebere enkrat, vlaki se združijo vzporedno.
+        odstrel_files: seznam (ime, bytes). Vrne {'trains': {ime datoteke: statistika (faza 2)},
+        'summary': statistika vseh vlakov skupaj}.
+        """
+        if not odstrel_files:
+            raise ValueError("Ni datotek odstrela.")
+        plan = self.load_plan(plan_bytes)
+        names = [name for name, _ in odstrel_files]
+        contents = [content for _, content in odstrel_files]
+
+        workers = pool_workers(workers, len(contents))
+        if workers <= 1:
+            frames = [self.merge_train(c, plan, is_t1=is_t1) for c in contents]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                frames = list(pool.map(_merge_train, contents, [plan] * len(contents), [is_t1] * len(contents)))
+
+        summary = self.process_phase_2(pd.concat(frames, ignore_index=True))
+        trains = {}
+        for name, df in zip(names, frames):
+            # Ista datoteka dvakrat -> "ime (2)"
+            key, n = name, 1
+            while key in trains:
+                n += 1
+                key = f"{name} ({n})"
+            trains[key] = self.process_phase_2(df)
+        return {'trains': trains, 'summary': summary}
 
     def process_phase_2(self, df_wag):
         """
@@ -149,13 +206,71 @@ class ToyotaTrainProcessor:
         report_text = f"{len(wagons)} Wagen mit Toyota Fahrzeuge\n"
         report_text += f"Skupaj/zusammen - {total_cars} vozil, teza {total_weight} kg"
 
+        # Python vrednosti namesto numpy skalarjev, da gre rezultat v JSON (odgovor in status joba)
         return {
-            "wagons": wagons.to_dict(orient='records'),
+            "wagons": [{k: self._xlsx_value(v) for k, v in w.items()} for w in wagons.to_dict(orient='records')],
             "stats": {
-                "total_weight": total_weight,
+                "total_weight": self._xlsx_value(total_weight),
                 "total_cars": total_cars,
-                "total_value": total_value,
+                "total_value": self._xlsx_value(total_value),
                 "wagons_count": len(wagons)
             },
             "report_text": report_text
         }
+
+    def _xlsx_value(self, value):
+        """None za None/NaN, numpy skalarji kot Python vrednosti (za xlsx celice in JSON)."""
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return None
+        return value.item() if isinstance(value, np.generic) else value
+
+    def export_excel(self, df_wag, phase_2=None):
+        """
+        Izvozi WAG tabelo, eTL tabelo po vagonih in vsote v xlsx (BytesIO).
+        Vrstice se pišejo sproti v constant_memory načinu, brez vmesnih slovarjev na vozilo.
+        phase_2 je rezultat process_phase_2; če ga ni, se izračuna.
+        """
+        if phase_2 is None:
+            phase_2 = self.process_phase_2(df_wag)
+
+        output = io.BytesIO()
+        wb = xlsxwriter.Workbook(output, {'constant_memory': True})
+        header_fmt = wb.add_format({'bold': True, 'bg_color': '#FFFF00', 'align': 'center'})
+        bold = wb.add_format({'bold': True})
+
+        # WAG
+        ws = wb.add_worksheet('WAG')
+        ws.set_column(0, len(df_wag.columns) - 1, 14)
+        ws.set_column(1, 1, 20) # VIN
+        ws.write_row(0, 0, list(df_wag.columns), header_fmt)
+        for r_idx, row in enumerate(df_wag.itertuples(index=False, name=None), start=1):
+            for c_idx, value in enumerate(row):
+                value = self._xlsx_value(value)
+                if value is not None and value != '':
+                    ws.write(r_idx, c_idx, value)
+
+        # eTL
+        stats = phase_2['stats']
+        ws = wb.add_worksheet('eTL')
+        ws.set_column(0, 0, 20)
+        ws.set_column(1, 3, 12)
+        ws.write_row(0, 0, ['MOT', 'LF', 'VOZIL', 'TEZA (kg)'], header_fmt)
+        row_idx = 1
+        for wagon in phase_2['wagons']:
+            ws.write_row(row_idx, 0, [self._xlsx_value(wagon.get(k)) for k in ('MOT', 'LF', 'VIN', 'WEIGHT')])
+            row_idx += 1
+
+        row_idx += 1
+        ws.write_row(row_idx, 0, ['Skupaj', stats['wagons_count'], stats['total_cars'],
+                                  self._xlsx_value(stats['total_weight'])], bold)
+        if 'VALUE' in df_wag.columns:
+            row_idx += 1
+            ws.write_row(row_idx, 0, ['Vrednost', None, None, self._xlsx_value(stats['total_value'])], bold)
+        row_idx += 2
+        for line in phase_2['report_text'].split('\n'):
+            ws.write(row_idx, 0, line)
+            row_idx += 1
+
+        wb.close()
+        output.seek(0)
+        return output
@@ -2,9 +2,15 @@ import pandas as pd
 import re
 import os
 import io
+import xlsxwriter
 from datetime import datetime
 
+from csv_ingest import parse_weights, read_csv_columns
+
 class VWAttListaHelper:
+    # Stolpci iz load_and_process v vrstnem redu izvoza
+    EXPORT_COLUMNS = ['VIN', 'INVOICE', 'DESCRIPTION', 'WEIGHT', 'DESTINATION', 'HS_CODE']
+
     def __init__(self):
         # Destinacije (kopirano iz JS)
         self.destinations_map = {
@@ -30,6 +36,25 @@ class VWAttListaHelper:
             return clean[:6]
         return clean
 
+    def column_map(self, columns):
+        """Ključ -> ime stolpca (imena že v velikih črkah, kot jih vrne load_stock)."""
+        col_map = {}
+        for c in columns:
+            if "CHASSIS" in c: col_map['CHASSIS'] = c
+            elif "DESTINATION" in c: col_map['DESTINATION'] = c
+            elif "INVOICE" in c: col_map['INVOICE'] = c
+            elif "DESCRIPTION" in c and "DAMAGE" not in c: col_map['DESCRIPTION'] = c
+            elif "WEIGHT" in c: col_map['WEIGHT'] = c
+            elif "HS-CODE" in c or "HS CODE" in c: col_map['HSCODE'] = c
+        return col_map
+
+    def load_stock(self, csv_file_obj):
+        """
+        Prebere VW Stock CSV (ločilo in kodiranje se prepoznata) z normaliziranimi imeni stolpcev.
+        Prebrani so samo stolpci iz column_map.
+        """
+        return read_csv_columns(csv_file_obj, select=lambda names: self.column_map(names).values())
+
     def load_and_process(self, csv_file_obj, chassis_list, diz_list, swb_no):
         """
         Glavna funkcija za obdelavo podatkov.
@@ -39,28 +64,12 @@ class VWAttListaHelper:
             diz_list: seznam nizov (DIZ številke)
             swb_no: SWB številka
         """
-        # 1. Branje CSV datoteke
-        try:
-            # VW CSV običajno uporablja podpičje
-            df = pd.read_csv(csv_file_obj, sep=';', on_bad_lines='skip', dtype=str)
-        except:
-            # Fallback na vejico (try re-reading if stream allows seek)
-            if hasattr(csv_file_obj, 'seek'):
-                csv_file_obj.seek(0)
-            df = pd.read_csv(csv_file_obj, sep=',', on_bad_lines='skip', dtype=str)
-
-        # Normalizacija imen stolpcev (v velike črke in brez presledkov)
-        df.columns = [c.strip().upper() for c in df.columns]
+        return self.process_stock(self.load_stock(csv_file_obj), chassis_list, diz_list, swb_no)
 
+    def process_stock(self, df, chassis_list, diz_list, swb_no):
+        """Obdelava že prebranega Stock CSV (load_stock); df se ne spreminja."""
         # Iskanje ključnih stolpcev (dinamično, kot v JS)
-        col_map = {}
-        for c in df.columns:
-            if "CHASSIS" in c: col_map['CHASSIS'] = c
-            elif "DESTINATION" in c: col_map['DESTINATION'] = c
-            elif "INVOICE" in c: col_map['INVOICE'] = c
-            elif "DESCRIPTION" in c and "DAMAGE" not in c: col_map['DESCRIPTION'] = c
-            elif "WEIGHT" in c: col_map['WEIGHT'] = c
-            elif "HS-CODE" in c or "HS CODE" in c: col_map['HSCODE'] = c
+        col_map = self.column_map(df.columns)
 
         # Preverjanje, če imamo obvezne stolpce
         if 'CHASSIS' not in col_map:
@@ -70,36 +79,37 @@ class VWAttListaHelper:
         clean_chassis_input = [c.strip() for c in chassis_list if c.strip()]
         
         # Filtriramo dataframe samo na tiste šasije, ki so v inputu
-        matched_df = df[df[col_map['CHASSIS']].isin(clean_chassis_input)].copy()
-        
-        # 3. Čiščenje in priprava podatkov v DataFrame-u
-        processed_data = []
-        
-        for _, row in matched_df.iterrows():
-            raw_dest = row.get(col_map.get('DESTINATION'), "")
-            mapped_dest = self.destinations_map.get(raw_dest, raw_dest)
-            final_dest = self.clean_destination(mapped_dest)
-            
-            weight_str = str(row.get(col_map.get('WEIGHT'), "0")).replace(',', '.')
-            try:
-                weight = int(float(weight_str))
-            except:
-                weight = 0
-
-            processed_data.append({
-                'VIN': row[col_map['CHASSIS']],
-                'INVOICE': row.get(col_map.get('INVOICE'), ""),
-                'DESCRIPTION': row.get(col_map.get('DESCRIPTION'), ""),
-                'WEIGHT': weight,
-                'DESTINATION': final_dest,
-                'HS_CODE': self.clean_hs_code(row.get(col_map.get('HSCODE'), ""))
-            })
-
-        final_df = pd.DataFrame(processed_data)
+        matched_df = df[df[col_map['CHASSIS']].isin(clean_chassis_input)].reset_index(drop=True)
 
-        if final_df.empty:
+        if matched_df.empty:
             raise ValueError("Nobenega vozila ni bilo mogoče najti.")
 
+        # 3. Čiščenje in priprava podatkov (po stolpcih; manjkajoč stolpec = privzeta vrednost)
+        def column(key, default):
+            col = col_map.get(key)
+            if col is None:
+                return pd.Series(default, index=matched_df.index, dtype=object)
+            return matched_df[col]
+
+        # NaN se obravnava kot niz 'nan' (enako kot str(NaN) v prejšnji obdelavi po vrsticah)
+        raw_dest = column('DESTINATION', "").fillna('nan')
+        final_dest = (raw_dest.map(self.destinations_map).fillna(raw_dest)
+                      .str.replace(r'\s*\(.*?\)\s*', '', regex=True).str.strip())
+
+        # HS kod je malo različnih, zato se vsaka očisti enkrat
+        hs_raw = column('HSCODE', "").fillna('nan')
+        hs_unique = hs_raw.unique()
+        hs_codes = hs_raw.map(dict(zip(hs_unique, map(self.clean_hs_code, hs_unique))))
+
+        final_df = pd.DataFrame({
+            'VIN': matched_df[col_map['CHASSIS']],
+            'INVOICE': column('INVOICE', ""),
+            'DESCRIPTION': column('DESCRIPTION', ""),
+            'WEIGHT': parse_weights(column('WEIGHT', "0")),
+            'DESTINATION': final_dest,
+            'HS_CODE': hs_codes
+        })
+
         # 4. Priprava struktur za poročila (Tabs logic)
         
         # --- A) Good Items (Group by HS Code) ---
@@ -140,94 +150,59 @@ class VWAttListaHelper:
         Ustvari Excel datoteko v pomnilniku (BytesIO).
         """
         output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        workbook = writer.book
-        
-        # --- Stili ---
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+
+        # Stili
         bold_fmt = workbook.add_format({'bold': True})
         header_fmt = workbook.add_format({
-            'bold': True, 
-            'bg_color': '#CCFFCC', 
-            'border': 1,
-            'align': 'center'
+            'bold': True, 'bg_color': '#CCFFCC', 'border': 1, 'align': 'center'
         })
-        
+
+        # Vrstice se pišejo sproti (constant_memory), NaN kot prazna celica
+        df = data_pack['df']
+        rows = df[self.EXPORT_COLUMNS].astype(object)
+        rows = rows.where(df[self.EXPORT_COLUMNS].notna(), None)
+
         # --- 1. Sheet: ALL VW ---
         ws_all = workbook.add_worksheet("ALL VW")
-        df = data_pack['df']
-        
-        # Header Block
         ws_all.write(1, 1, f"ATTACHED LIST SWB NO.: {data_pack['swb_no']}", bold_fmt)
         ws_all.write(1, 2, "T2L", header_fmt)
-        
-        headers = ["", "VINS:", "Invoices nos.:", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"]
-        for col_num, header in enumerate(headers):
-            ws_all.write(2, col_num, header, bold_fmt)
-            
-        # Zapis podatkov
-        total_weight = 0
-        for i, row in df.iterrows():
-            row_idx = i + 3
-            total_weight += row['WEIGHT']
-            
-            ws_all.write(row_idx, 0, i + 1)
-            ws_all.write(row_idx, 1, row['VIN'])
-            ws_all.write(row_idx, 2, row['INVOICE'])
-            ws_all.write(row_idx, 3, row['DESCRIPTION'])
-            ws_all.write(row_idx, 4, row['WEIGHT'])
-            ws_all.write(row_idx, 5, row['DESTINATION'])
-            ws_all.write(row_idx, 6, row['HS_CODE'])
-            
-        # Footer
-        last_row = len(df) + 3
-        ws_all.write(last_row, 4, total_weight, bold_fmt)
-        
+        ws_all.write_row(2, 0, ["", "VINS:", "Invoices nos.:", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"], bold_fmt)
+
+        for i, row in enumerate(rows.itertuples(index=False, name=None)):
+            ws_all.write_row(i + 3, 0, (i + 1,) + row)
+
+        ws_all.write(len(df) + 3, 4, df['WEIGHT'].sum(), bold_fmt)
         ws_all.set_column(0, 0, 5)
         ws_all.set_column(1, 6, 20)
 
         # --- 2. Sheets per HS Code (Chunks of 99) ---
-        unique_hs = df['HS_CODE'].unique()
-        unique_hs = sorted(unique_hs)
+        # En groupby prehod; skupine so urejene po HS kodi
+        chunk_size = 99
         sheet_names_counter = {}
+        sub_headers = ["CHASSIS", "INVOICE", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"]
+
+        for hs, hs_rows in rows.groupby(df['HS_CODE'], sort=True):
+            hs_weights = df['WEIGHT'].loc[hs_rows.index]
+            for start in range(0, len(hs_rows), chunk_size):
+                chunk = hs_rows.iloc[start:start + chunk_size]
 
-        for hs in unique_hs:
-            hs_vehicles = df[df['HS_CODE'] == hs]
-            
-            chunk_size = 99
-            num_chunks = (len(hs_vehicles) + chunk_size - 1) // chunk_size
-            
-            for i in range(num_chunks):
-                chunk = hs_vehicles.iloc[i*chunk_size : (i+1)*chunk_size]
-                chunk_total_weight = chunk['WEIGHT'].sum()
-                
                 base_name = f"{len(chunk)}x {hs}"
                 sheet_name = base_name
-                
                 if sheet_name in sheet_names_counter:
                     sheet_names_counter[sheet_name] += 1
                     sheet_name = f"{base_name} ({sheet_names_counter[sheet_name]})"
                 else:
                     sheet_names_counter[sheet_name] = 1
-                    
+
                 ws_hs = workbook.add_worksheet(sheet_name[:31])
-                
-                sub_headers = ["CHASSIS", "INVOICE", "DESCRIPTION", "WEIGHT", "DESTINATION", "HS CODE"]
-                for c_idx, h_txt in enumerate(sub_headers):
-                    ws_hs.write(0, c_idx, h_txt, bold_fmt)
-                    
-                r_idx = 1
-                for _, row in chunk.iterrows():
-                    ws_hs.write(r_idx, 0, row['VIN'])
-                    ws_hs.write(r_idx, 1, row['INVOICE'])
-                    ws_hs.write(r_idx, 2, row['DESCRIPTION'])
-                    ws_hs.write(r_idx, 3, row['WEIGHT'])
-                    ws_hs.write(r_idx, 4, row['DESTINATION'])
-                    ws_hs.write(r_idx, 5, row['HS_CODE'])
-                    r_idx += 1
-                    
-                ws_hs.write(r_idx, 3, chunk_total_weight, bold_fmt)
+                ws_hs.write_row(0, 0, sub_headers, bold_fmt)
+                for r_idx, row in enumerate(chunk.itertuples(index=False, name=None), start=1):
+                    ws_hs.write_row(r_idx, 0, row)
+
+                ws_hs.write(len(chunk) + 1, 3, hs_weights.iloc[start:start + chunk_size].sum(), bold_fmt)
                 ws_hs.set_column(0, 5, 20)
 
-        writer.close()
+        workbook.close()
         output.seek(0)
         return output